@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+
+def is_healthy_status(status):
+    # Rate limiting and server errors mean the host is struggling, a 404 or 403 does not
+    return status != 429 and status < 500
+
+
+class HostState:
+    def __init__(self, delay, concurrency, window):
+        self.delay = delay
+        self.concurrency = concurrency
+        self.active = 0
+        self.last_start = 0.0
+        self.average_latency = None
+        self.outcomes = deque(maxlen=window)
+
+
+class AutoThrottle:
+    # Per host request spacing and concurrency in the spirit of Scrapy's AutoThrottle. The delay moves towards
+    # latency / target_concurrency and never shrinks on an error, concurrency grows by one every `concurrency`
+    # healthy responses and halves on errors or when the error rate of the recent window passes error_threshold.
+    def __init__(self, start_delay=0.0, min_delay=0.0, max_delay=30.0, target_concurrency=2.0, min_concurrency=1,
+                 max_concurrency=4, error_threshold=0.2, window=20):
+        self.start_delay = start_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.target_concurrency = target_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.error_threshold = error_threshold
+        self.window = window
+        self.hosts = {}
+
+    def state(self, host):
+        if host not in self.hosts:
+            self.hosts[host] = HostState(self.start_delay, float(self.min_concurrency), self.window)
+        return self.hosts[host]
+
+    async def acquire(self, host):
+        state = self.state(host)
+        while True:
+            if state.active >= int(state.concurrency):
+                await asyncio.sleep(0.05)
+                continue
+            wait = state.last_start + state.delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            state.active += 1
+            state.last_start = time.monotonic()
+            return
+
+    def release(self, host, latency, ok):
+        state = self.state(host)
+        state.active -= 1
+        state.outcomes.append(ok)
+        error_rate = state.outcomes.count(False) / len(state.outcomes)
+        previous_level = int(state.concurrency)
+
+        target_delay = latency / self.target_concurrency
+        delay = (state.delay + target_delay) / 2
+        if not ok:
+            delay = max(delay, state.delay * 2, self.min_delay or 0.1)
+        state.delay = min(self.max_delay, max(self.min_delay, delay))
+
+        if not ok or error_rate > self.error_threshold:
+            state.concurrency = max(self.min_concurrency, state.concurrency / 2)
+        elif state.average_latency and latency > 2 * state.average_latency:
+            state.concurrency = max(self.min_concurrency, state.concurrency - 1)  # The host slows down under load
+        else:
+            state.concurrency = min(self.max_concurrency, state.concurrency + 1 / state.concurrency)
+        if state.average_latency is None:
+            state.average_latency = latency
+        else:
+            state.average_latency = 0.8 * state.average_latency + 0.2 * latency
+
+        if int(state.concurrency) != previous_level:
+            logging.info('Throttle for %s: concurrency %d, delay %.2fs, latency %.2fs, error rate %.0f%%', host,
+                         int(state.concurrency), state.delay, latency, error_rate * 100)
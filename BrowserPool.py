@@ -0,0 +1,81 @@
+import glob
+import logging
+import os
+
+
+class BrowserPool:
+    # Browsers are launched once with a persistent profile per slot and, with keep_alive, left running between crawls.
+    # The next run connects to the saved websocket endpoint instead of starting Chrome with a cold cache.
+    def __init__(self, chrome_path=None, headless=True, user_data_dir=None, keep_alive=False):
+        self.chrome_path = chrome_path
+        self.headless = headless
+        self.user_data_dir = user_data_dir
+        self.keep_alive = keep_alive and bool(user_data_dir)
+
+    def endpoint_path(self, slot):
+        return os.path.join(self.user_data_dir, 'browser-%d.ws' % slot)
+
+    def read_endpoint(self, slot):
+        if not self.user_data_dir or not os.path.exists(self.endpoint_path(slot)):
+            return None
+        with open(self.endpoint_path(slot)) as f:
+            return f.read().strip() or None
+
+    def remove_endpoint(self, slot):
+        if self.user_data_dir and os.path.exists(self.endpoint_path(slot)):
+            os.remove(self.endpoint_path(slot))
+
+    async def acquire(self, slot=0):
+        from pyppeteer import connect, launch
+
+        endpoint = self.read_endpoint(slot)
+        if endpoint:
+            try:
+                browser = await connect(browserWSEndpoint=endpoint)
+                logging.info('Connected to warm browser %d at %s', slot, endpoint)
+                return browser
+            except Exception as e:
+                logging.info('Saved browser %d is gone, launching a new one: %s', slot, str(e))
+                self.remove_endpoint(slot)
+
+        options = {'executablePath': self.chrome_path, 'headless': self.headless}
+        if self.user_data_dir:
+            options['userDataDir'] = os.path.abspath(os.path.join(self.user_data_dir, 'browser-%d' % slot))
+            os.makedirs(options['userDataDir'], exist_ok=True)
+        if self.keep_alive:
+            # Without these pyppeteer kills Chrome when the crawl exits or is interrupted
+            options.update(autoClose=False, handleSIGINT=False, handleSIGTERM=False, handleSIGHUP=False)
+        browser = await launch(**options)
+        if self.keep_alive:
+            with open(self.endpoint_path(slot), 'w') as f:
+                f.write(browser.wsEndpoint)
+        return browser
+
+    async def release(self, browser, slot=0):
+        if self.keep_alive:
+            await browser.disconnect()
+        else:
+            await browser.close()
+            self.remove_endpoint(slot)
+
+    async def warm(self, count):
+        # Launches (or checks) count browsers ahead of the crawls that will use them
+        if not self.keep_alive:
+            logging.warning('Not warming browsers: without keep_alive and a user_data_dir they close again right away')
+            return
+        for slot in range(count):
+            await self.release(await self.acquire(slot), slot)
+
+    async def shutdown(self):
+        from pyppeteer import connect
+
+        for endpoint_path in glob.glob(os.path.join(self.user_data_dir or '', 'browser-*.ws')):
+            with open(endpoint_path) as f:
+                endpoint = f.read().strip()
+            try:
+                browser = await connect(browserWSEndpoint=endpoint)
+                await browser.close()
+                logging.info('Closed warm browser at %s', endpoint)
+            except Exception as e:
+                logging.info('Browser at %s was already gone: %s', endpoint, str(e))
+            os.remove(endpoint_path)
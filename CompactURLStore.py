@@ -0,0 +1,193 @@
+import hashlib
+import math
+from array import array
+from collections.abc import MutableMapping, MutableSet
+
+ABSENT = -2
+ROOT = -1
+
+
+class BloomFilter:
+    def __init__(self, expected_items, false_positive_rate):
+        self.size = max(8, int(-expected_items * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / expected_items * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, fingerprint):
+        # Double hashing over the two halves of the 64-bit URL fingerprint
+        first = fingerprint & 0xffffffff
+        second = (fingerprint >> 32) | 1
+        return [(first + index * second) % self.size for index in range(self.hash_count)]
+
+    def add(self, fingerprint):
+        for position in self.positions(fingerprint):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, fingerprint):
+        return all(self.bits[position >> 3] >> (position & 7) & 1 for position in self.positions(fingerprint))
+
+
+class URLInterner:
+    # Every URL string is stored once and everything else refers to it by its integer id. URLs are found through an
+    # open addressing table of 64-bit fingerprints, 16 bytes per slot instead of a dict entry with two int objects.
+    def __init__(self, bloom_filter=None, capacity=1024):
+        self.urls = []
+        self.bloom_filter = bloom_filter
+        self.fingerprints = array('Q', bytes(8 * capacity))
+        self.ids = array('q', bytes(8 * capacity))
+
+    def fingerprint(self, url):
+        fingerprint = int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+        return fingerprint or 1  # 0 marks an empty slot
+
+    def slot(self, fingerprint):
+        mask = len(self.fingerprints) - 1
+        index = fingerprint & mask
+        while self.fingerprints[index] and self.fingerprints[index] != fingerprint:
+            index = (index + 1) & mask
+        return index
+
+    def intern(self, url):
+        fingerprint = self.fingerprint(url)
+        index = self.slot(fingerprint)
+        if self.fingerprints[index]:
+            return self.ids[index]
+        url_id = len(self.urls)
+        self.urls.append(url)
+        self.fingerprints[index] = fingerprint
+        self.ids[index] = url_id
+        if self.bloom_filter is not None:
+            self.bloom_filter.add(fingerprint)
+        if len(self.urls) * 3 > len(self.fingerprints) * 2:
+            self.grow()
+        return url_id
+
+    def grow(self):
+        fingerprints, ids = self.fingerprints, self.ids
+        self.fingerprints = array('Q', bytes(16 * len(fingerprints)))
+        self.ids = array('q', bytes(16 * len(ids)))
+        for fingerprint, url_id in zip(fingerprints, ids):
+            if fingerprint:
+                index = self.slot(fingerprint)
+                self.fingerprints[index] = fingerprint
+                self.ids[index] = url_id
+
+    def lookup(self, url):
+        fingerprint = self.fingerprint(url)
+        if self.bloom_filter is not None and fingerprint not in self.bloom_filter:
+            return None  # Never interned, no need to probe the fingerprint table
+        index = self.slot(fingerprint)
+        return self.ids[index] if self.fingerprints[index] else None
+
+
+class CompactURLSet(MutableSet):
+    # One bit per interned URL
+    def __init__(self, interner):
+        self.interner = interner
+        self.bits = bytearray()
+        self.count = 0
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        # Set operators such as - and | return plain sets of URLs
+        return set(iterable)
+
+    def has_id(self, url_id):
+        byte = url_id >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] >> (url_id & 7) & 1)
+
+    def __contains__(self, url):
+        url_id = self.interner.lookup(url)
+        return url_id is not None and self.has_id(url_id)
+
+    def __iter__(self):
+        for url_id in range(len(self.bits) * 8):
+            if self.has_id(url_id):
+                yield self.interner.urls[url_id]
+
+    def __len__(self):
+        return self.count
+
+    def add(self, url):
+        url_id = self.interner.intern(url)
+        if self.has_id(url_id):
+            return
+        byte = url_id >> 3
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte + 1 - len(self.bits) + len(self.bits) // 2))
+        self.bits[byte] |= 1 << (url_id & 7)
+        self.count += 1
+
+    def update(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def discard(self, url):
+        url_id = self.interner.lookup(url)
+        if url_id is not None and self.has_id(url_id):
+            self.discard_id(url_id)
+
+    def discard_id(self, url_id):
+        self.bits[url_id >> 3] &= ~(1 << (url_id & 7))
+        self.count -= 1
+
+
+class CompactDepths:
+    # Depth of every URL in the crawl graph as an array indexed by url id, -1 where it is not known yet
+    def __init__(self, interner):
+        self.interner = interner
+        self.depths = array('i')
+
+    def get(self, url, default=None):
+        url_id = self.interner.lookup(url)
+        if url_id is None or url_id >= len(self.depths) or self.depths[url_id] < 0:
+            return default
+        return self.depths[url_id]
+
+    def __setitem__(self, url, depth):
+        url_id = self.interner.intern(url)
+        if url_id >= len(self.depths):
+            self.depths.extend([-1] * (url_id + 1 - len(self.depths) + len(self.depths) // 2))
+        self.depths[url_id] = depth
+
+
+class CompactSequence(MutableMapping):
+    # The url -> parent url map as an array of parent ids indexed by url id
+    def __init__(self, interner):
+        self.interner = interner
+        self.parents = array('q')
+        self.order = array('q')
+
+    def parent_id(self, url_id):
+        if url_id is None or url_id >= len(self.parents):
+            return ABSENT
+        return self.parents[url_id]
+
+    def __getitem__(self, url):
+        parent_id = self.parent_id(self.interner.lookup(url))
+        if parent_id == ABSENT:
+            raise KeyError(url)
+        return None if parent_id == ROOT else self.interner.urls[parent_id]
+
+    def __setitem__(self, url, parent_url):
+        url_id = self.interner.intern(url)
+        parent_id = ROOT if parent_url is None else self.interner.intern(parent_url)
+        while url_id >= len(self.parents):
+            self.parents.append(ABSENT)
+        if self.parents[url_id] == ABSENT:
+            self.order.append(url_id)
+        self.parents[url_id] = parent_id
+
+    def __delitem__(self, url):
+        url_id = self.interner.lookup(url)
+        if self.parent_id(url_id) == ABSENT:
+            raise KeyError(url)
+        self.parents[url_id] = ABSENT
+        self.order.remove(url_id)
+
+    def __iter__(self):
+        for url_id in self.order:
+            yield self.interner.urls[url_id]
+
+    def __len__(self):
+        return len(self.order)
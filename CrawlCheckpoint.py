@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import time
+
+
+class CrawlCheckpoint:
+    # Every URL of a crawl is one row holding its parent and whether it is only a graph node (a sitemap), pending or
+    # visited. A checkpoint writes the rows that changed since the previous one, so its cost does not grow with the
+    # size of the crawl.
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(db_path)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS crawls ('
+                'start_url TEXT PRIMARY KEY, completed INTEGER NOT NULL, updated_at REAL NOT NULL)'
+            )
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS crawl_urls ('
+                'start_url TEXT NOT NULL, url TEXT NOT NULL, parent TEXT, state TEXT NOT NULL, '
+                'PRIMARY KEY (start_url, url))'
+            )
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS executed_functions ('
+                'start_url TEXT NOT NULL, function TEXT NOT NULL, PRIMARY KEY (start_url, function))'
+            )
+
+    def reset(self, start_url):
+        with self.connection:
+            for table in ('crawls', 'crawl_urls', 'executed_functions'):
+                self.connection.execute('DELETE FROM %s WHERE start_url = ?' % table, (start_url,))
+
+    def save(self, start_url, parents, queued_urls, finished_urls, executed_functions):
+        # One transaction, so a crash mid-write keeps the previous checkpoint
+        with self.connection:
+            self.connection.execute(
+                'REPLACE INTO crawls (start_url, completed, updated_at) VALUES (?, 0, ?)', (start_url, time.time())
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO crawl_urls (start_url, url, parent, state) VALUES (?, ?, ?, 'node')",
+                [(start_url, url, parent_url) for url, parent_url in parents.items()]
+            )
+            self.connection.executemany(
+                'UPDATE crawl_urls SET parent = ? WHERE start_url = ? AND url = ?',
+                [(parent_url, start_url, url) for url, parent_url in parents.items()]
+            )
+            self.connection.executemany(
+                "UPDATE crawl_urls SET state = 'pending' WHERE start_url = ? AND url = ? AND state = 'node'",
+                [(start_url, url) for url in queued_urls]
+            )
+            self.connection.executemany(
+                "UPDATE crawl_urls SET state = 'visited' WHERE start_url = ? AND url = ?",
+                [(start_url, url) for url in finished_urls]
+            )
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO executed_functions (start_url, function) VALUES (?, ?)',
+                [(start_url, function) for function in executed_functions]
+            )
+
+    def mark_completed(self, start_url):
+        # A completed crawl is skipped on resume, its URLs are not needed any more
+        with self.connection:
+            self.connection.execute('DELETE FROM crawl_urls WHERE start_url = ?', (start_url,))
+            self.connection.execute('DELETE FROM executed_functions WHERE start_url = ?', (start_url,))
+            self.connection.execute(
+                'REPLACE INTO crawls (start_url, completed, updated_at) VALUES (?, 1, ?)', (start_url, time.time())
+            )
+
+    def load(self, start_url):
+        row = self.connection.execute('SELECT completed FROM crawls WHERE start_url = ?', (start_url,)).fetchone()
+        if row is None:
+            return None
+        state = {'completed': bool(row[0]), 'visited_urls': [], 'pending_urls': [], 'sequence': {}}
+        for url, parent_url, url_state in self.connection.execute(
+                'SELECT url, parent, state FROM crawl_urls WHERE start_url = ?', (start_url,)):
+            state['sequence'][url] = parent_url
+            if url_state == 'visited':
+                state['visited_urls'].append(url)
+            elif url_state == 'pending':
+                state['pending_urls'].append(url)
+        state['executed_functions'] = [function for function, in self.connection.execute(
+            'SELECT function FROM executed_functions WHERE start_url = ?', (start_url,))]
+        return state
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+import time
+import zlib
+
+from CrawlCheckpoint import CrawlCheckpoint
+from CrawlSession import CrawlSession
+from pyppeteer_spider_bfs import PyppeteerSpider
+
+
+def shard_for(key, processes):
+    # crc32 instead of hash() so every process agrees on the shard regardless of PYTHONHASHSEED
+    return zlib.crc32(key.encode('utf-8')) % processes
+
+
+class CrawlCoordinator:
+    def __init__(self, spider, processes, shard_by='domain'):
+        self.spider = spider
+        self.processes = processes
+        self.shard_by = shard_by
+        self.outstanding = [0] * processes
+        self.sessions = {}
+        self.start_times = {}
+
+    def run(self):
+        spider = self.spider
+        spider.checkpoint = CrawlCheckpoint(spider.checkpoint_path)
+        spider.metrics.open()
+        logging.basicConfig(level=logging.INFO)
+
+        context = multiprocessing.get_context('spawn')
+        result_queue = context.Queue()
+        task_queues = [context.Queue() for _ in range(self.processes)]
+        workers = [context.Process(target=run_worker, args=(worker_id, task_queue, result_queue, spider.incremental,
+                                                                spider.config_path))
+                   for worker_id, task_queue in enumerate(task_queues)]
+        for worker in workers:
+            worker.start()
+
+        for url in spider.start_urls:
+            session = spider.start_session(url)
+            if session:
+                if spider.sitemap_seeder:
+                    asyncio.run(spider.seed_frontier(session))
+                self.sessions[url] = session
+                self.start_times[url] = time.time()
+        try:
+            while True:
+                self.dispatch(task_queues)
+                if not any(self.outstanding):
+                    if not any(session.retry_urls and not spider.budget_exhausted(session)
+                               for session in self.sessions.values()):
+                        break
+                    time.sleep(0.5)  # Only retries waiting for their backoff are left
+                    continue
+                try:
+                    result = result_queue.get(timeout=5)
+                except queue.Empty:
+                    if not all(worker.is_alive() for worker in workers):
+                        raise RuntimeError('A crawl worker process exited unexpectedly')
+                    continue
+                self.outstanding[result['worker_id']] -= 1
+                self.merge(result)
+            for session in list(self.sessions.values()):
+                self.finish(session)
+        except Exception as e:
+            logging.error('Crawl Error: %s', str(e))
+            for session in self.sessions.values():
+                spider.save_checkpoint(session)
+                spider.finish_session(session, self.start_times[session.start_url], True)
+            self.sessions = {}
+            raise
+        finally:
+            for task_queue in task_queues:
+                task_queue.put(None)
+            for worker in workers:
+                worker.join(timeout=30)
+            spider.checkpoint.close()
+            spider.metrics.close()
+
+    def dispatch(self, task_queues):
+        capacity = self.spider.tabs
+        for session in self.sessions.values():
+            if all(outstanding >= capacity for outstanding in self.outstanding):
+                return
+            if self.shard_by == 'domain' and self.outstanding[shard_for(session.domain, self.processes)] >= capacity:
+                continue
+            # URLs leave the frontier in priority order, those whose worker is busy go back in afterwards
+            self.spider.release_retries(session)
+            deferred = []
+            while session.pending_urls and not self.spider.budget_exhausted(session):
+                if all(outstanding >= capacity for outstanding in self.outstanding):
+                    break
+                url = session.pending_urls.pop()
+                normalized_url = url  # The frontier only holds canonical URLs
+                key = session.domain if self.shard_by == 'domain' else normalized_url
+                worker_id = shard_for(key, self.processes)
+                if self.outstanding[worker_id] >= capacity:
+                    deferred.append(url)
+                    continue
+                if normalized_url in session.visited_urls:
+                    continue
+                session.visited_urls.add(normalized_url)
+                if self.spider.circuit_open(session, normalized_url):
+                    continue
+                session.in_progress_urls.add(normalized_url)
+                task_queues[worker_id].put({
+                    'start_url': session.start_url,
+                    'url': url,
+                    'parent_url': session.sequence.get(normalized_url),
+                    'executed_functions': list(session.executed_functions),
+                })
+                self.outstanding[worker_id] += 1
+            for url in deferred:
+                session.pending_urls.add(url, session.depth(url))
+
+    def merge(self, result):
+        # Edges are replayed through the same add_to_frontier rules a single-process crawl applies
+        spider = self.spider
+        session = self.sessions[result['start_url']]
+        session.in_progress_urls.discard(result['normalized_url'])
+        session.executed_functions.update(result['executed_functions'])
+        session.page_fingerprints.update(result['page_fingerprints'])
+        if result['error']:
+            logging.error('Visit of %s failed: %s', result['url'], result['error'])
+        for url, parent_url, method in result['edges']:
+            spider.add_to_frontier(session, url, parent_url, method)
+        if result['trace']:
+            spider.metrics.record(result['trace'], len(session.pending_urls))
+        # Every result reports back, a failed visit may be the probe a paused host waits on
+        spider.record_visit(session, result['normalized_url'], result['status'])
+
+        session.pages_since_checkpoint += 1
+        if session.pages_since_checkpoint >= spider.checkpoint_interval:
+            spider.save_checkpoint(session)
+        unfinished = session.pending_urls or session.retry_urls
+        if (not unfinished or spider.budget_exhausted(session)) and not session.in_progress_urls:
+            self.finish(session)
+
+    def finish(self, session):
+        del self.sessions[session.start_url]
+        self.spider.finish_session(session, self.start_times[session.start_url], False)
+
+
+def run_worker(worker_id, task_queue, result_queue, incremental, config_path):
+    logging.basicConfig(level=logging.INFO)
+    spider = PyppeteerSpider(incremental=incremental, config_path=config_path)
+    asyncio.run(serve_tasks(spider, worker_id, task_queue, result_queue))
+
+
+async def serve_tasks(spider, worker_id, task_queue, result_queue):
+    # Every worker process has its own slot, and so its own profile, in the browser pool
+    await spider.launch_browser(worker_id)
+    contexts = {}
+    previous_fingerprints = {}
+    tabs = [serve_tab(spider, worker_id, task_queue, result_queue, contexts, previous_fingerprints)
+            for _ in range(spider.tabs)]
+    try:
+        await asyncio.gather(*tabs)
+    finally:
+        for context in contexts.values():
+            await spider.close_context(await context)
+        await spider.close_browser(worker_id)
+
+
+async def serve_tab(spider, worker_id, task_queue, result_queue, contexts, previous_fingerprints):
+    loop = asyncio.get_running_loop()
+    pages = {}
+    try:
+        while True:
+            task = await loop.run_in_executor(None, task_queue.get)
+            if task is None:
+                task_queue.put(None)  # Let the other tabs of this worker see the stop signal too
+                break
+            start_url = task['start_url']
+            if start_url not in contexts:
+                contexts[start_url] = asyncio.ensure_future(spider.open_context())
+            if start_url not in pages:
+                pages[start_url] = await spider.open_page(await contexts[start_url])
+            result_queue.put(await visit_task(spider, worker_id, pages[start_url], task, previous_fingerprints))
+    finally:
+        for page in pages.values():
+            await spider.close_page(page)
+
+
+async def visit_task(spider, worker_id, page, task, previous_fingerprints):
+    # The worker visits the page against a scratch session and reports what it found back to the coordinator
+    session = CrawlSession(task['start_url'], spider.normalize_url(task['start_url']))
+    normalized_url = task['url']
+    session.sequence[normalized_url] = task['parent_url']
+    session.visited_urls.add(normalized_url)
+    session.executed_functions = set(task['executed_functions'])
+    if spider.incremental:
+        if session.domain not in previous_fingerprints:
+            previous_fingerprints[session.domain] = spider.load_fingerprints(session.domain)
+        session.previous_fingerprints = previous_fingerprints[session.domain]
+    edges = []
+    session.edge_listener = lambda url, parent_url, method: edges.append((url, parent_url, method))
+    error = None
+    trace = None
+    status = 'error'
+    try:
+        trace = await spider.visit_page(page, task['url'], session)
+        status = trace.status
+    except Exception as e:
+        error = str(e)
+    return {
+        'worker_id': worker_id,
+        'start_url': task['start_url'],
+        'url': task['url'],
+        'normalized_url': normalized_url,
+        'edges': edges,
+        'executed_functions': list(session.executed_functions - set(task['executed_functions'])),
+        'page_fingerprints': session.page_fingerprints,
+        'error': error,
+        'status': status,
+        'trace': trace.to_dict() if trace else None,
+    }
@@ -0,0 +1,51 @@
+import heapq
+import itertools
+from fnmatch import fnmatch
+
+
+class CrawlFrontier:
+    # URLs pop breadth first by depth. A URL matching a priority pattern is scheduled as if it were that many levels
+    # shallower (a negative priority defers it), ties keep discovery order. Over a CompactURLSet the heap holds the
+    # interned URL ids instead of the URL strings.
+    def __init__(self, urls=None, priorities=None):
+        self.urls = set() if urls is None else urls
+        self.interner = getattr(self.urls, 'interner', None)
+        self.priorities = list((priorities or {}).items())
+        self.heap = []
+        self.counter = itertools.count()
+
+    def priority(self, url):
+        for pattern, priority in self.priorities:
+            if fnmatch(url, pattern):
+                return int(priority)
+        return 0
+
+    def key(self, url):
+        return url if self.interner is None else self.interner.lookup(url)
+
+    def queued(self, key):
+        return key in self.urls if self.interner is None else self.urls.has_id(key)
+
+    def add(self, url, depth=0):
+        if url in self.urls:
+            return
+        self.urls.add(url)
+        heapq.heappush(self.heap, (depth - self.priority(url), next(self.counter), self.key(url)))
+
+    def pop(self):
+        while self.heap:
+            key = heapq.heappop(self.heap)[2]
+            if self.queued(key):
+                url = key if self.interner is None else self.interner.urls[key]
+                self.urls.discard(url)
+                return url
+        raise KeyError('pop from an empty frontier')
+
+    def __contains__(self, url):
+        return url in self.urls
+
+    def __iter__(self):
+        return iter(self.urls)
+
+    def __len__(self):
+        return len(self.urls)
@@ -0,0 +1,228 @@
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRIC_PREFIX = 'domainexplorer_'
+
+
+class PageTrace:
+    # Phases are timed exclusively: a settle wait inside click exploration is charged to settle, not to clicks
+    def __init__(self, url, domain):
+        self.url = url
+        self.domain = domain
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        self.status = 'ok'
+        self.phases = {}
+        self.events = {}
+        self.active = []
+
+    def enter(self, phase):
+        now = time.perf_counter()
+        if self.active:
+            self.charge(now)
+        self.active.append([phase, now])
+
+    def exit(self):
+        self.charge(time.perf_counter())
+        self.active.pop()
+        if self.active:
+            self.active[-1][1] = time.perf_counter()
+
+    def charge(self, now):
+        phase, started = self.active[-1]
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - started
+        self.active[-1][1] = now
+
+    def count(self, event, amount=1):
+        self.events[event] = self.events.get(event, 0) + amount
+
+    def close(self):
+        self.seconds = time.perf_counter() - self.started
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'domain': self.domain,
+            'started_at': self.started_at,
+            'seconds': self.seconds,
+            'status': self.status,
+            'phases': self.phases,
+            'events': self.events,
+        }
+
+
+class CrawlMetrics:
+    def __init__(self, trace_path=None, prometheus_path=None, prometheus_port=None, flush_interval=5,
+                 throughput_window=60):
+        self.trace_path = trace_path
+        self.prometheus_path = prometheus_path
+        self.prometheus_port = prometheus_port
+        self.flush_interval = flush_interval
+        self.throughput_window = throughput_window
+        self.lock = threading.Lock()
+        self.pages = {}
+        self.page_seconds = {}
+        self.phase_seconds = {}
+        self.events = {}
+        self.frontier_sizes = {}
+        self.recent_pages = {}
+        self.trace_file = None
+        self.server = None
+        self.opened = False
+        self.last_flush = 0.0
+
+    def open(self):
+        # Only the process that owns the frontier opens the outputs, crawl worker processes just collect page traces
+        self.opened = True
+        if self.trace_path:
+            os.makedirs(os.path.dirname(self.trace_path) or '.', exist_ok=True)
+            self.trace_file = open(self.trace_path, 'a', buffering=1)
+        if self.prometheus_port:
+            self.server = ThreadingHTTPServer(('', int(self.prometheus_port)), self.handler())
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.write_prometheus()
+        self.opened = False
+        if self.trace_file:
+            self.trace_file.close()
+            self.trace_file = None
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def start_page(self, url, domain):
+        return PageTrace(url, domain)
+
+    @contextlib.contextmanager
+    def phase(self, trace, phase):
+        if trace is None:
+            yield
+            return
+        trace.enter(phase)
+        try:
+            yield
+        finally:
+            trace.exit()
+
+    def finish_page(self, trace, frontier_size):
+        trace.close()
+        self.record(trace.to_dict(), frontier_size)
+
+    def record(self, trace, frontier_size):
+        domain = trace['domain']
+        now = time.time()
+        with self.lock:
+            self.pages[domain] = self.pages.get(domain, 0) + 1
+            self.page_seconds[domain] = self.page_seconds.get(domain, 0.0) + trace['seconds']
+            for phase, seconds in trace['phases'].items():
+                self.phase_seconds[domain, phase] = self.phase_seconds.get((domain, phase), 0.0) + seconds
+            for event, amount in trace['events'].items():
+                self.events[domain, event] = self.events.get((domain, event), 0) + amount
+            if trace['status'] != 'ok':
+                self.events[domain, trace['status']] = self.events.get((domain, trace['status']), 0) + 1
+            self.frontier_sizes[domain] = frontier_size
+            self.recent_pages.setdefault(domain, deque()).append(now)
+        if self.trace_file:
+            self.trace_file.write(json.dumps(dict(trace, frontier_size=frontier_size)) + '\n')
+        if self.opened and now - self.last_flush >= self.flush_interval:
+            self.write_prometheus()
+
+    def increment(self, domain, event, amount=1):
+        with self.lock:
+            self.events[domain, event] = self.events.get((domain, event), 0) + amount
+
+    def pages_per_second(self, domain, now=None):
+        # Throughput over the last throughput_window seconds, the number to alert on when a crawl slows down
+        now = now or time.time()
+        recent = self.recent_pages.get(domain, deque())
+        while recent and recent[0] < now - self.throughput_window:
+            recent.popleft()
+        return len(recent) / self.throughput_window
+
+    def phase_totals(self, domain=None):
+        totals = {}
+        for (phase_domain, phase), seconds in self.phase_seconds.items():
+            if domain is None or phase_domain == domain:
+                totals[phase] = totals.get(phase, 0.0) + seconds
+        return totals
+
+    def summary(self, domain):
+        totals = self.phase_totals(domain)
+        total = sum(totals.values()) or 1.0
+        return ', '.join('%s %.1fs (%d%%)' % (phase, totals[phase], 100 * totals[phase] / total)
+                         for phase in sorted(totals, key=totals.get, reverse=True))
+
+    def render(self):
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append('# HELP %s%s %s' % (METRIC_PREFIX, name, help_text))
+            lines.append('# TYPE %s%s %s' % (METRIC_PREFIX, name, metric_type))
+            for labels, value in samples:
+                label_text = ','.join('%s="%s"' % (key, str(label).replace('\\', '\\\\').replace('"', '\\"'))
+                                      for key, label in labels)
+                lines.append('%s%s{%s} %s' % (METRIC_PREFIX, name, label_text, value))
+
+        with self.lock:
+            now = time.time()
+            metric('pages_total', 'counter', 'Pages visited.',
+                   [((('domain', domain),), count) for domain, count in sorted(self.pages.items())])
+            metric('page_seconds_total', 'counter', 'Seconds spent visiting pages.',
+                   [((('domain', domain),), '%.6f' % seconds) for domain, seconds in sorted(self.page_seconds.items())])
+            metric('phase_seconds_total', 'counter', 'Seconds spent in each crawl phase.',
+                   [((('domain', domain), ('phase', phase)), '%.6f' % seconds)
+                    for (domain, phase), seconds in sorted(self.phase_seconds.items())])
+            metric('events_total', 'counter', 'Clicks, timeouts, navigation errors and skipped duplicates.',
+                   [((('domain', domain), ('event', event)), count)
+                    for (domain, event), count in sorted(self.events.items())])
+            metric('frontier_size', 'gauge', 'URLs waiting to be visited.',
+                   [((('domain', domain),), size) for domain, size in sorted(self.frontier_sizes.items())])
+            metric('pages_per_second', 'gauge', 'Pages visited per second over the recent window.',
+                   [((('domain', domain),), '%.3f' % self.pages_per_second(domain, now))
+                    for domain in sorted(self.pages)])
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self):
+        self.last_flush = time.time()
+        if not self.opened or not self.prometheus_path:
+            return
+        directory = os.path.dirname(self.prometheus_path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        # Written next to the target and renamed so a scraping textfile collector never reads half a file
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w') as f:
+                f.write(self.render())
+            os.replace(temporary_path, self.prometheus_path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+    def handler(self):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                payload = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
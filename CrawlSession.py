@@ -0,0 +1,87 @@
+import time
+from urllib.parse import urlparse
+
+from CompactURLStore import BloomFilter, CompactDepths, CompactSequence, CompactURLSet, URLInterner
+from CrawlFrontier import CrawlFrontier
+
+
+class CrawlSession:
+    def __init__(self, start_url, normalized_start_url, compact_state=None, priorities=None):
+        self.start_url = start_url
+        self.normalized_start_url = normalized_start_url
+        self.domain = urlparse(normalized_start_url).netloc
+        self.started_at = time.time()
+        self.context = None
+        if compact_state:
+            # URLs are interned once and the visited set, frontier and parent map only hold integer ids
+            bloom_filter = None
+            bloom_options = compact_state.get('bloom_filter')
+            if bloom_options:
+                bloom_filter = BloomFilter(int(bloom_options.get('expected_urls', 1000000)),
+                                           float(bloom_options.get('false_positive_rate', 0.01)))
+            interner = URLInterner(bloom_filter)
+            self.visited_urls = CompactURLSet(interner)
+            self.pending_urls = CrawlFrontier(CompactURLSet(interner), priorities)
+            self.sequence = CompactSequence(interner)
+            self.depths = CompactDepths(interner)
+        else:
+            self.visited_urls = set()
+            self.pending_urls = CrawlFrontier(priorities=priorities)
+            self.sequence = {}
+            self.depths = {}
+        self.executed_functions = set()
+        self.route_scripts = set()
+        self.in_progress_urls = set()
+        # (time.monotonic() to retry at, url) of failed visits, the URLs stay visited until they are retried
+        self.retry_urls = []
+        self.retry_attempts = {}
+        self.active_visits = 0
+        self.pages_since_checkpoint = 0
+        # What changed since the last checkpoint: new parents, newly queued URLs and finished visits
+        self.changed_parents = {}
+        self.queued_urls = set()
+        self.finished_urls = set()
+        self.checkpointed_functions = set()
+        self.previous_fingerprints = {}
+        self.page_fingerprints = {}
+        self.page_children = {}
+        # Called with (url, parent_url, method) for every same-domain edge the crawler discovers
+        self.edge_listener = None
+        self.edge_stream = None
+        self.robots = None
+        self.resumed = False
+
+    def seed(self):
+        self.pending_urls.add(self.normalized_start_url)
+        self.set_parent(self.normalized_start_url, None)  # Add an initial entry to the sequence dictionary
+        self.queued_urls.add(self.normalized_start_url)
+
+    def set_parent(self, url, parent_url):
+        self.sequence[url] = parent_url
+        self.changed_parents[url] = parent_url
+        self.depths[url] = self.depth(parent_url) + 1 if parent_url is not None else 0
+
+    def restore(self, checkpoint_state):
+        self.visited_urls.update(checkpoint_state['visited_urls'])
+        self.sequence.update(checkpoint_state['sequence'])
+        for url in checkpoint_state['pending_urls']:
+            self.pending_urls.add(url, self.depth(url))
+        self.executed_functions = set(checkpoint_state['executed_functions'])
+        self.checkpointed_functions = set(self.executed_functions)
+        self.resumed = True
+
+    def depth(self, url):
+        # Number of parent links between the URL and the start URL. Stored when the URL gets its parent, the sequence
+        # chain is only followed for URLs restored from a checkpoint
+        depth = self.depths.get(url)
+        if depth is not None:
+            return depth
+        depth = 0
+        seen = {url}
+        parent = self.sequence.get(url)
+        while parent is not None and parent not in seen:
+            seen.add(parent)
+            depth += 1
+            parent = self.sequence.get(parent)
+        self.depths[url] = depth
+        return depth
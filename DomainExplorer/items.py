@@ -7,6 +7,10 @@ import scrapy
 
 
 class DomainexplorerItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
-    pass
+    # One edge of the crawl graph: the page and the page it was first discovered on
+    url = scrapy.Field()
+    parent = scrapy.Field()
+    depth = scrapy.Field()
+    status = scrapy.Field()  # None when the request failed without a response
+    download_latency = scrapy.Field()
+    fetched_at = scrapy.Field()
@@ -3,11 +3,77 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+import json
+import os
+import sqlite3
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
+ITEM_FIELDS = ['url', 'parent', 'depth', 'status', 'download_latency', 'fetched_at']
+
 
 class DomainexplorerPipeline:
+    # Buffers edge items and writes them batch_size at a time, in one transaction per batch for SQLite or one
+    # write per batch for JSON lines, so the output costs a fraction of the crawl instead of a commit per page
+    def __init__(self, output_path, batch_size):
+        self.output_path = output_path
+        self.batch_size = batch_size
+        self.batch = []
+        self.item_count = 0
+        self.connection = None
+        self.file = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.get('DOMAINEXPLORER_OUTPUT', 'data/scrapy_edges.db'),
+                   crawler.settings.getint('DOMAINEXPLORER_BATCH_SIZE', 500))
+
+    def open_spider(self, spider):
+        directory = os.path.dirname(self.output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.output_path.endswith('.jsonl'):
+            # Appends, so a crawl resumed from its JOBDIR continues the same file
+            self.file = open(self.output_path, 'a', encoding='utf-8')
+            return
+        self.connection = sqlite3.connect(self.output_path)
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS edges (
+                url TEXT PRIMARY KEY,
+                parent TEXT,
+                depth INTEGER,
+                status INTEGER,
+                download_latency REAL,
+                fetched_at REAL
+            )
+        ''')
+        self.connection.commit()
+
     def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        self.batch.append([adapter.get(field) for field in ITEM_FIELDS])
+        if len(self.batch) >= self.batch_size:
+            self.flush()
         return item
+
+    def flush(self):
+        if not self.batch:
+            return
+        if self.connection:
+            with self.connection:
+                # A page re-downloaded after a resume replaces its earlier row
+                self.connection.executemany('INSERT OR REPLACE INTO edges VALUES (?, ?, ?, ?, ?, ?)', self.batch)
+        else:
+            self.file.write(''.join(json.dumps(dict(zip(ITEM_FIELDS, row))) + '\n' for row in self.batch))
+            self.file.flush()
+        self.item_count += len(self.batch)
+        self.batch = []
+
+    def close_spider(self, spider):
+        self.flush()
+        if self.connection:
+            self.connection.close()
+        if self.file:
+            self.file.close()
+        spider.logger.info('Wrote %d edges to %s', self.item_count, self.output_path)
@@ -22,6 +22,16 @@ ROBOTSTXT_OBEY = True
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
 #CONCURRENT_REQUESTS = 32
 
+# Crawl breadth first, with pending requests in FIFO queues that go to disk when a JOBDIR is set
+# See https://docs.scrapy.org/en/latest/faq.html#does-scrapy-crawl-in-breadth-first-or-depth-first-order
+DEPTH_PRIORITY = 1
+SCHEDULER_DISK_QUEUE = "scrapy.squeues.PickleFifoDiskQueue"
+SCHEDULER_MEMORY_QUEUE = "scrapy.squeues.FifoMemoryQueue"
+
+# Pause and resume a crawl by running it with a job directory, e.g. scrapy crawl spider -s JOBDIR=data/scrapy_job
+# The request queue, the dupefilter's request fingerprints (requests.seen) and the spider state are kept there
+#JOBDIR = "data/scrapy_job"
+
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
 # See also autothrottle settings and docs
@@ -62,9 +72,14 @@ ROBOTSTXT_OBEY = True
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    "DomainExplorer.pipelines.DomainexplorerPipeline": 300,
-#}
+ITEM_PIPELINES = {
+    "DomainExplorer.pipelines.DomainexplorerPipeline": 300,
+}
+
+# Where the pipeline writes crawl edges: a SQLite database, or JSON lines when the path ends in .jsonl
+DOMAINEXPLORER_OUTPUT = "data/scrapy_edges.db"
+# Number of edges written per transaction (SQLite) or write (JSON lines)
+DOMAINEXPLORER_BATCH_SIZE = 500
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -1,46 +1,59 @@
 import scrapy
+import time
 from urllib.parse import urlparse
 import logging
-from tabulate import tabulate
+
+from DomainExplorer.items import DomainexplorerItem
 
 
 class Spider(scrapy.Spider):
     name = 'spider'
     # demo_sites = ['https://demo.owasp-juice.shop/sitemap.xml#/', 'https://clever-lichterman-044f16.netlify.app/']
     start_urls = ['https://www.globalsqa.com/angularJs-protractor/BankingProject']  # Replace with your initial URL(s)
-    visited_urls = set()
-    sequence = {}
+
+    # Visited URLs and parents are not kept on the spider: the dupefilter remembers request fingerprints, the
+    # parent travels in the request meta and every edge leaves as an item, so a crawl with a JOBDIR can pause
+    # and resume with its pending requests on disk
+
+    def start_requests(self):
+        for url in self.start_urls:
+            yield scrapy.Request(url, callback=self.parse, errback=self.record_failure, dont_filter=True)
 
     def parse(self, response):
         current_url = response.url
-        parent_url = self.sequence.get(current_url)
-        if not parent_url:
-            parent_url = response.request.headers.get('Referer', None)
-        if parent_url:
-            parent_url = parent_url.decode('utf-8')
-
-        self.visited_urls.add(current_url)
-        self.sequence[current_url] = parent_url
+        parent_url = response.meta.get('parent')
 
         self.logger.info('Visited URL: %s', current_url)
         if parent_url:
             self.logger.info('Retrieved from: %s', parent_url)
 
-        # Process the response as needed
-        # Extract data, follow links, etc.
+        yield self.edge_item(current_url, response.request, response.status)
 
         # Extract links from the page
         links = response.xpath('//a/@href').getall()
         for link in links:
             absolute_url = response.urljoin(link)
-            if self.is_same_domain(absolute_url) and absolute_url not in self.visited_urls:
-                yield scrapy.Request(url=absolute_url, callback=self.parse)
-
-    def closed(self, reason):
-        visited_data = [(url, self.sequence.get(url, '')) for url in self.visited_urls]
-        headers = ['Visited URL', 'Parent URL']
-        table = tabulate(visited_data, headers=headers, tablefmt='pretty')
-        self.logger.info('Crawling completed. Visited URLs:\n%s', table)
+            if self.is_same_domain(absolute_url):
+                # Requests for pages already seen are dropped by the dupefilter
+                yield scrapy.Request(url=absolute_url, callback=self.parse, errback=self.record_failure,
+                                     meta={'parent': current_url})
+
+    def record_failure(self, failure):
+        # HTTP error statuses and requests that failed after their retries still become edges of the graph
+        request = failure.request
+        response = getattr(failure.value, 'response', None)
+        self.logger.info('Failed URL: %s (%s)', request.url, failure.getErrorMessage())
+        yield self.edge_item(request.url, request, response.status if response is not None else None)
+
+    def edge_item(self, url, request, status):
+        return DomainexplorerItem(
+            url=url,
+            parent=request.meta.get('parent'),
+            depth=request.meta.get('depth', 0),
+            status=status,
+            download_latency=request.meta.get('download_latency'),
+            fetched_at=time.time(),
+        )
 
     def is_same_domain(self, url):
         start_domain = urlparse(self.start_urls[0]).netloc
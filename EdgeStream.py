@@ -0,0 +1,48 @@
+import json
+import logging
+import os
+import time
+
+
+class EdgeStream:
+    # Appends every parent assignment of the crawl as one JSON line the moment it is made, so the crawl graph is on
+    # disk (and can be tailed) while the crawl runs and survives a crash
+    def __init__(self, file_path, append=False):
+        self.file_path = file_path
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(file_path, 'a' if append else 'w', buffering=1)
+        self.edge_count = 0
+        if append and self.file.tell() and not self.ends_with_newline():
+            self.file.write('\n')  # Ends a line cut short by a crash so the next edge starts on its own line
+
+    def ends_with_newline(self):
+        with open(self.file_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def write(self, url, parent_url, method):
+        self.file.write(json.dumps({'parent': parent_url, 'child': url, 'method': method, 'time': time.time()}) + '\n')
+        self.edge_count += 1
+
+    def close(self):
+        self.file.close()
+
+    @classmethod
+    def read(cls, file_path):
+        with open(file_path) as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Only the last line can be cut short, by a crash in the middle of a write
+                    logging.info('Skipping incomplete edge on line %d of %s', line_number, file_path)
+
+    @classmethod
+    def load_parents(cls, file_path):
+        # Replays the stream with the crawler's own rule: a later assignment (a click) replaces the earlier parent
+        parents = {}
+        for edge in cls.read(file_path):
+            parents[edge['child']] = edge['parent']
+        return parents
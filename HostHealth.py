@@ -0,0 +1,67 @@
+import logging
+import math
+import time
+from collections import deque
+
+
+class HostHealth:
+    # Navigation timeouts follow each host's own latency: multiplier times the given percentile of its recent page
+    # loads, within min_timeout and max_timeout. A host that fails failure_threshold times in a row is paused for
+    # cooldown seconds, after which a single probe decides whether it closes again or stays paused twice as long.
+    def __init__(self, default_timeout=15.0, min_timeout=5.0, max_timeout=30.0, percentile=95, multiplier=3.0,
+                 min_samples=5, window=50, failure_threshold=5, cooldown=30.0, max_cooldown=600.0):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.latencies = {}
+        self.failures = {}
+        self.open_until = {}
+        self.cooldowns = {}
+        self.probing = set()
+
+    def timeout(self, host):
+        samples = self.latencies.get(host)
+        if not samples or len(samples) < self.min_samples:
+            return self.default_timeout
+        ordered = sorted(samples)
+        latency = ordered[max(0, math.ceil(self.percentile / 100 * len(ordered)) - 1)]
+        return min(self.max_timeout, max(self.min_timeout, self.multiplier * latency))
+
+    def observe(self, host, latency):
+        # A timed out load is observed at its timeout, so a host that got slower raises its own timeout
+        self.latencies.setdefault(host, deque(maxlen=self.window)).append(latency)
+
+    def blocked_until(self, host):
+        # Returns the time.monotonic() a paused host can be tried again at, or None when a request may go out
+        open_until = self.open_until.get(host)
+        if open_until is None:
+            return None
+        now = time.monotonic()
+        if now >= open_until and host not in self.probing:
+            self.probing.add(host)
+            return None
+        return max(open_until, now + 1)
+
+    def record(self, host, ok):
+        probe = host in self.probing
+        self.probing.discard(host)
+        if ok:
+            self.failures[host] = 0
+            if self.open_until.pop(host, None) is not None:
+                self.cooldowns.pop(host, None)
+                logging.info('Circuit for %s closed, the host answers again', host)
+            return
+        self.failures[host] = self.failures.get(host, 0) + 1
+        if probe or self.failures[host] >= self.failure_threshold:
+            cooldown = min(self.max_cooldown, self.cooldowns[host] * 2) if host in self.cooldowns else self.cooldown
+            self.cooldowns[host] = cooldown
+            self.open_until[host] = time.monotonic() + cooldown
+            logging.info('Circuit for %s opened after %d failures, pausing it for %.0fs', host, self.failures[host],
+                         cooldown)
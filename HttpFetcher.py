@@ -0,0 +1,105 @@
+import asyncio
+import urllib.error
+import urllib.request
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+LINK_ATTRIBUTES = {'ng-href', 'routerlink', 'data-href'}
+# Attributes that only mean something once AngularJS, Angular or React has run in a browser, plus the click
+# handlers the browser crawl clicks (CLICK_ATTRIBUTES, lowercased by html.parser)
+SPA_ATTRIBUTES = {'ng-app', 'data-ng-app', 'ng-controller', 'ng-view', 'ui-view', 'ng-click', 'ng-version',
+                  'data-reactroot', 'onclick', 'click'}
+SPA_TAGS = {'app-root', 'ng-view', 'ui-view'}
+APP_MOUNT_IDS = {'root', 'app', '__next', '__nuxt'}
+MIN_STATIC_TEXT_LENGTH = 200
+
+
+class HttpPage:
+    def __init__(self, url, status, content_type, body):
+        self.url = url
+        self.status = status
+        self.content_type = content_type
+        self.body = body
+
+    @property
+    def is_html(self):
+        return 'html' in self.content_type
+
+
+class PageAnalyzer(HTMLParser):
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.links = []
+        self.script_count = 0
+        self.text_length = 0
+        self.has_spa_markers = False
+        self.has_app_mount = False
+        self.skip_text_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+        if tag == 'base' and attributes.get('href'):
+            self.base_url = urljoin(self.base_url, attributes['href'])
+        if tag == 'a' and attributes.get('href'):
+            self.links.append(urljoin(self.base_url, attributes['href']))
+        for name, value in attributes.items():
+            if name in LINK_ATTRIBUTES and value and '{{' not in value:
+                self.links.append(urljoin(self.base_url, value))
+            if name in SPA_ATTRIBUTES:
+                self.has_spa_markers = True
+        if tag in SPA_TAGS:
+            self.has_spa_markers = True
+        if attributes.get('id') in APP_MOUNT_IDS:
+            self.has_app_mount = True
+        if tag == 'script':
+            self.script_count += 1
+        if tag in ('script', 'style', 'noscript', 'template'):
+            self.skip_text_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style', 'noscript', 'template') and self.skip_text_depth:
+            self.skip_text_depth -= 1
+
+    def handle_data(self, data):
+        if not self.skip_text_depth:
+            self.text_length += len(data.strip())
+
+    @property
+    def needs_rendering(self):
+        if self.has_spa_markers:
+            return True
+        # An almost empty body that loads scripts is an app shell, e.g. <div id="root"></div>
+        return self.script_count > 0 and self.text_length < MIN_STATIC_TEXT_LENGTH and (
+            self.has_app_mount or not self.links)
+
+
+class HttpFetcher:
+    def __init__(self, timeout=15, max_bytes=5 * 1024 * 1024, user_agent='DomainExplorer'):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.user_agent = user_agent
+
+    async def fetch(self, url):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.fetch_sync, url)
+
+    def fetch_sync(self, url):
+        request = urllib.request.Request(url, headers={'User-Agent': self.user_agent})
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            response = e
+        with response:
+            content_type = response.headers.get('Content-Type', '')
+            charset = response.headers.get_content_charset() or 'utf-8'
+            body = b''
+            if 'html' in content_type:
+                body = response.read(self.max_bytes)
+            return HttpPage(response.geturl(), response.status, content_type, body.decode(charset, 'replace'))
+
+    def analyze(self, http_page):
+        analyzer = PageAnalyzer(http_page.url)
+        analyzer.feed(http_page.body)
+        analyzer.close()
+        return analyzer
@@ -0,0 +1,43 @@
+import hashlib
+import logging
+
+INLINE_SCRIPTS_JS = "() => Array.from(document.querySelectorAll('script:not([src])')).map(script => script.text)"
+
+
+class PageFingerprinter:
+    def __init__(self, page):
+        self.page = page
+        self.script_signatures = []
+        self.document_fingerprint = None
+        page.on('response', self.on_response)
+
+    def on_response(self, response):
+        if response.request.resourceType == 'script':
+            headers = response.headers
+            self.script_signatures.append(' '.join([
+                response.url,
+                headers.get('etag', ''),
+                headers.get('last-modified', ''),
+                headers.get('content-length', ''),
+            ]))
+
+    def start_navigation(self):
+        self.script_signatures = []
+
+    async def fingerprint(self, response):
+        # Navigations that only change the hash return no response and keep the current document and scripts
+        if response is None:
+            return self.document_fingerprint
+        digest = hashlib.sha256()
+        try:
+            digest.update((await response.text()).encode('utf-8'))
+            for inline_script in await self.page.evaluate(INLINE_SCRIPTS_JS):
+                digest.update(inline_script.encode('utf-8'))
+        except Exception as e:
+            logging.debug('Fingerprint Error: %s', str(e))
+            self.document_fingerprint = None
+            return None
+        for signature in sorted(self.script_signatures):
+            digest.update(signature.encode('utf-8'))
+        self.document_fingerprint = digest.hexdigest()
+        return self.document_fingerprint
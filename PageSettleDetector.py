@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+# Installs a MutationObserver on first use (the window is fresh after every navigation) and reports
+# how long the DOM has been quiet and whether AngularJS / Angular still has work in flight.
+SETTLE_PROBE_JS = '''() => {
+    if (!window.__domainExplorerSettle) {
+        const state = {lastMutation: Date.now()};
+        new MutationObserver(() => { state.lastMutation = Date.now(); }).observe(document, {
+            subtree: true, childList: true, attributes: true, characterData: true
+        });
+        window.__domainExplorerSettle = state;
+    }
+    let angularBusy = false;
+    try {
+        if (window.angular) {
+            const root = document.querySelector('[ng-app], [data-ng-app], .ng-scope') || document.body;
+            const injector = window.angular.element(root).injector();
+            if (injector) {
+                angularBusy = injector.get('$http').pendingRequests.length > 0 ||
+                    !!injector.get('$rootScope').$$phase;
+            }
+        }
+        if (window.getAllAngularTestabilities) {
+            angularBusy = angularBusy || window.getAllAngularTestabilities().some(t => !t.isStable());
+        }
+    } catch (e) {}
+    return {domQuietFor: Date.now() - window.__domainExplorerSettle.lastMutation, angularBusy: angularBusy};
+}'''
+
+
+class PageSettleDetector:
+    # The network counts as idle with at most max_idle_requests in flight (Puppeteer's networkidle2), so long-polling,
+    # event streams and beacons that never finish do not hold every settle until the timeout
+    def __init__(self, page, timeout=3, quiet_period=0.5, poll_interval=0.1, max_idle_requests=2):
+        self.page = page
+        self.timeout = timeout
+        self.quiet_period = quiet_period
+        self.poll_interval = poll_interval
+        self.max_idle_requests = max_idle_requests
+        self.inflight_requests = set()
+        self.last_network_activity = time.monotonic()
+        page.on('request', self.on_request_started)
+        page.on('requestfinished', self.on_request_done)
+        page.on('requestfailed', self.on_request_done)
+        page.on('framenavigated', self.on_frame_navigated)
+
+    def on_request_started(self, request):
+        self.inflight_requests.add(request)
+        self.last_network_activity = time.monotonic()
+
+    def on_request_done(self, request):
+        self.inflight_requests.discard(request)
+        self.last_network_activity = time.monotonic()
+
+    def on_frame_navigated(self, frame):
+        # Requests of the previous document may never report finished or failed once it is gone
+        if frame.parentFrame is None:
+            self.inflight_requests.clear()
+
+    def is_network_idle(self):
+        return (len(self.inflight_requests) <= self.max_idle_requests and
+                time.monotonic() - self.last_network_activity >= self.quiet_period)
+
+    async def wait(self):
+        # Returns True as soon as the page is quiet, or False once the old fixed delay has elapsed
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self.is_network_idle():
+                try:
+                    state = await self.page.evaluate(SETTLE_PROBE_JS)
+                except Exception:
+                    state = None  # The execution context was replaced by a navigation
+                if state and not state['angularBusy'] and state['domQuietFor'] >= self.quiet_period * 1000:
+                    return True
+            await asyncio.sleep(self.poll_interval)
+        return False
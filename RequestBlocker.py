@@ -0,0 +1,55 @@
+import asyncio
+import logging
+from urllib.parse import urlparse
+
+DEFAULT_BLOCKED_RESOURCE_TYPES = ['image', 'font', 'media', 'stylesheet']
+DEFAULT_BLOCKED_HOSTS = [
+    'google-analytics.com',
+    'googletagmanager.com',
+    'googlesyndication.com',
+    'doubleclick.net',
+    'facebook.net',
+    'hotjar.com',
+    'segment.io',
+    'newrelic.com',
+    'nr-data.net',
+]
+# Route discovery depends on these, so they are never aborted because of their resource type
+ROUTING_RESOURCE_TYPES = {'document', 'script', 'xhr', 'fetch'}
+
+
+class RequestBlocker:
+    def __init__(self, resource_types=None, hosts=None):
+        if resource_types is None:
+            resource_types = DEFAULT_BLOCKED_RESOURCE_TYPES
+        if hosts is None:
+            hosts = DEFAULT_BLOCKED_HOSTS
+        self.resource_types = set(resource_types) - ROUTING_RESOURCE_TYPES
+        self.hosts = [host.lower() for host in hosts]
+        self.blocked_count = 0
+
+    async def attach(self, page):
+        await page.setRequestInterception(True)
+        page.on('request', lambda request: asyncio.ensure_future(self.intercept_request(request)))
+
+    async def intercept_request(self, request):
+        try:
+            if self.should_block(request):
+                self.blocked_count += 1
+                await request.abort()
+            else:
+                await request.continue_()
+        except Exception as e:
+            # The page navigated or closed before the request was resolved
+            logging.debug('Request Interception Error: %s', str(e))
+
+    def should_block(self, request):
+        if request.resourceType == 'document':
+            return False
+        if request.resourceType in self.resource_types:
+            return True
+        return self.is_blocked_host(urlparse(request.url).hostname or '')
+
+    def is_blocked_host(self, hostname):
+        hostname = hostname.lower()
+        return any(hostname == host or hostname.endswith('.' + host) for host in self.hosts)
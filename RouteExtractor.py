@@ -0,0 +1,130 @@
+import hashlib
+import logging
+import re
+from urllib.parse import urljoin, urlparse
+
+# Route tables as they appear in application sources and in minified bundles
+ANGULARJS_ROUTE = re.compile(r'''\.when\(\s*(['"])(/[^'"]*)\1''')
+UI_ROUTER_STATE = re.compile(r'''\.state\(\s*(['"])([\w.]+)\1\s*,\s*\{[^{}]*?\burl\s*:\s*(['"])([^'"]*)\3''')
+UI_ROUTER_STATE_OBJECT = re.compile(r'''\bname\s*:\s*(['"])([\w.]+)\1\s*,[^{}]*?\burl\s*:\s*(['"])([^'"]*)\3''')
+ANGULAR_ROUTE = re.compile(r'''\{\s*path\s*:\s*(['"])([^'"]*)\1\s*,\s*'''
+                           r'''(?:component|loadChildren|loadComponent|redirectTo|children|canActivate|pathMatch)\s*:''')
+REACT_ROUTE = re.compile(r'''\bpath\s*:\s*(['"])(/[^'"]*)\1\s*,\s*'''
+                         r'''(?:element|component|Component|render|exact|children|loader|lazy|errorElement)\s*:''')
+REACT_ROUTE_AFTER = re.compile(r'''\b(?:exact|element|component)\s*:\s*[^,{}]+,\s*path\s*:\s*(['"])(/[^'"]*)\1''')
+JSX_ROUTE = re.compile(r'''<Route\b[^>]*?\bpath=(['"])(/[^'"]*)\1''')
+
+HTML5_MODE = re.compile(r'''html5Mode\(\s*(?:true|!0|\{[^}]*?enabled\s*:\s*(?:true|!0))''')
+HASH_PREFIX = re.compile(r'''hashPrefix\(\s*(['"])(.*?)\1\s*\)''')
+USE_HASH = re.compile(r'''useHash\s*:\s*(?:true|!0)''')
+HASH_ROUTER = re.compile(r'''\b(?:HashRouter|createHashRouter)\b''')
+
+PAGE_SCRIPTS_JS = '''() => ({
+    baseURI: document.baseURI,
+    location: window.location.href,
+    inline: Array.from(document.querySelectorAll('script:not([src])')).map(script => script.text),
+})'''
+
+
+def is_navigable(path):
+    # Parameterized, wildcard and regex routes have no single URL to visit
+    return not any(character in path for character in ':*(')
+
+
+class RouteExtractor:
+    def __init__(self):
+        self.script_routes = {}
+        self.script_responses = {}
+
+    def attach(self, page):
+        responses = self.script_responses.setdefault(page, [])
+
+        def on_response(response):
+            if response.request.resourceType == 'script' and response.ok:
+                responses.append(response)
+        page.on('response', on_response)
+
+    def detach(self, page):
+        self.script_responses.pop(page, None)
+
+    def analyze(self, source):
+        # Returns the route paths of every router found in a script and the hints that decide how they become URLs
+        routes = []
+        if '$routeProvider' in source or 'ngRoute' in source:
+            routes += [('angularjs', match.group(2)) for match in ANGULARJS_ROUTE.finditer(source)]
+        if '$stateProvider' in source or 'ui.router' in source:
+            states = {}
+            for pattern in (UI_ROUTER_STATE, UI_ROUTER_STATE_OBJECT):
+                for match in pattern.finditer(source):
+                    states.setdefault(match.group(2), match.group(4))
+            for name in states:
+                routes.append(('angularjs', self.state_url(name, states)))
+        routes += [('angular', match.group(2)) for match in ANGULAR_ROUTE.finditer(source)]
+        for pattern in (REACT_ROUTE, REACT_ROUTE_AFTER, JSX_ROUTE):
+            routes += [('react', match.group(2)) for match in pattern.finditer(source)]
+        hash_prefix = HASH_PREFIX.search(source)
+        return {
+            'routes': sorted({route for route in routes if route[1] and is_navigable(route[1])}),
+            'html5_mode': bool(HTML5_MODE.search(source)),
+            'hash_prefix': hash_prefix.group(2) if hash_prefix else None,
+            'use_hash': bool(USE_HASH.search(source)),
+            'hash_router': bool(HASH_ROUTER.search(source)),
+        }
+
+    def state_url(self, name, states):
+        # ui-router child state URLs are relative to their parent state unless they start with ^
+        url = states[name]
+        if url.startswith('^'):
+            return url[1:]
+        parent = name.rpartition('.')[0]
+        return (self.state_url(parent, states) if parent in states else '') + url
+
+    def resolve(self, framework, path, analysis, page_url, base_uri):
+        document_url = page_url.split('#')[0]
+        if framework == 'angularjs':
+            if analysis['html5_mode']:
+                return urljoin(base_uri, path.lstrip('/'))
+            fragment = urlparse(page_url).fragment
+            if fragment.startswith(('/', '!/')):
+                prefix = '#!' if fragment.startswith('!') else '#'
+            elif analysis['hash_prefix'] is not None:
+                prefix = '#' + analysis['hash_prefix']
+            else:
+                prefix = '#!'  # The AngularJS default since 1.6
+            return document_url + prefix + path
+        if framework == 'angular':
+            if analysis['use_hash']:
+                return document_url + '#/' + path.lstrip('/')
+            return urljoin(base_uri, path.lstrip('/'))
+        if analysis['hash_router']:
+            return document_url + '#' + path
+        return urljoin(base_uri, path)
+
+    async def extract(self, page, seen_scripts):
+        # Returns the URLs of the routes in scripts this crawl has not seeded from yet, bundles are analyzed once
+        page_scripts = await page.evaluate(PAGE_SCRIPTS_JS)
+        sources = []
+        for response in self.script_responses.get(page, []):
+            if response.url not in self.script_routes:
+                try:
+                    self.script_routes[response.url] = self.analyze(await response.text())
+                except Exception as e:
+                    logging.debug('Script Read Error: %s', str(e))
+                    continue
+            sources.append(response.url)
+        self.script_responses[page] = []
+        for inline_script in page_scripts['inline']:
+            key = 'inline:' + hashlib.sha1(inline_script.encode('utf-8')).hexdigest()
+            if key not in self.script_routes:
+                self.script_routes[key] = self.analyze(inline_script)
+            sources.append(key)
+
+        urls = []
+        for source in sources:
+            if source in seen_scripts:
+                continue
+            seen_scripts.add(source)
+            analysis = self.script_routes[source]
+            for framework, path in analysis['routes']:
+                urls.append(self.resolve(framework, path, analysis, page_scripts['location'], page_scripts['baseURI']))
+        return urls
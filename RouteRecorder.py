@@ -0,0 +1,48 @@
+import logging
+
+# Installed before any page script runs, so route changes made by the app's router are recorded inside the page
+ROUTE_HOOK_JS = '''() => {
+    if (window.__domainExplorerRoutes) {
+        return;
+    }
+    const state = {document: Math.random().toString(36).slice(2), routes: []};
+    window.__domainExplorerRoutes = state;
+    const record = () => state.routes.push(window.location.href);
+    for (const method of ['pushState', 'replaceState']) {
+        const original = history[method];
+        history[method] = function () {
+            const result = original.apply(this, arguments);
+            record();
+            return result;
+        };
+    }
+    window.addEventListener('hashchange', record);
+    window.addEventListener('popstate', record);
+}'''
+
+# Returns and clears the routes recorded since the last drain, with a token that changes with every new document
+DRAIN_ROUTES_JS = '''() => {
+    const state = window.__domainExplorerRoutes;
+    const routes = state ? state.routes.splice(0) : [];
+    return {document: state ? state.document : null, routes: routes, url: window.location.href};
+}'''
+
+
+class RouteRecorder:
+    def __init__(self, page):
+        self.page = page
+
+    async def attach(self):
+        await self.page.evaluateOnNewDocument(ROUTE_HOOK_JS)
+
+    async def drain(self):
+        try:
+            return await self.page.evaluate(DRAIN_ROUTES_JS)
+        except Exception as e:
+            # The execution context was replaced by a navigation that is still loading
+            logging.debug('Route Drain Error: %s', str(e))
+            return {'document': None, 'routes': [], 'url': self.page.url}
+
+    async def go_back(self):
+        # Pops the route in the page, the app's router re-renders without a document round trip
+        await self.page.evaluate('() => history.back()')
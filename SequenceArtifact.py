@@ -0,0 +1,93 @@
+import json
+
+COMPACT_FORMAT = 'parent-pointers'
+COMPACT_FORMAT_VERSION = 1
+
+
+def link(path):
+    # A path as nested (url, prefix) pairs, so paths that share a prefix share its pairs instead of copying it
+    linked = None
+    for url in path:
+        linked = (url, linked)
+    return linked
+
+
+class SequenceArtifact:
+    def __init__(self, parents):
+        self.parents = parents
+        self.resolved_paths = {}
+        self.resolved_depths = {}
+
+    @classmethod
+    def load(cls, file_path):
+        # Reads both the compact parent-pointer format and the original {url: full path} format
+        with open(file_path) as f:
+            data = json.load(f)
+        if data.get('format') == COMPACT_FORMAT:
+            return cls({url: node['parent'] for url, node in data['nodes'].items()})
+        return cls.from_paths(data)
+
+    @classmethod
+    def from_paths(cls, url_sequences):
+        return cls({url: path[-2] if len(path) > 1 else None for url, path in url_sequences.items()})
+
+    def walk(self, url):
+        # The original path walk, only used for URLs whose parent chain loops back on itself
+        path = [url]
+        parent = self.parents.get(url)
+        while parent:
+            if parent in path:
+                break
+            path.append(parent)
+            parent = self.parents.get(parent)
+        path.reverse()
+        return path
+
+    def unresolved_chain(self, url, resolved):
+        # Follows parent pointers until a resolved URL, a root or a cycle, returning the chain and where it stopped
+        chain = []
+        on_chain = set()
+        node = url
+        while node and node not in resolved and node not in on_chain:
+            chain.append(node)
+            on_chain.add(node)
+            node = self.parents.get(node)
+        if node and node not in resolved:
+            cycle_start = chain.index(node)
+            for cycle_node in chain[cycle_start:]:
+                path = self.walk(cycle_node)
+                self.resolved_paths[cycle_node] = link(path)
+                self.resolved_depths[cycle_node] = len(path) - 1
+            chain = chain[:cycle_start]
+        return chain, node
+
+    def path(self, url):
+        if url not in self.resolved_paths:
+            chain, node = self.unresolved_chain(url, self.resolved_paths)
+            prefix = self.resolved_paths[node] if node else None
+            for chain_node in reversed(chain):
+                prefix = (chain_node, prefix)
+                self.resolved_paths[chain_node] = prefix
+        path = []
+        linked = self.resolved_paths[url]
+        while linked:
+            path.append(linked[0])
+            linked = linked[1]
+        path.reverse()
+        return path
+
+    def depth(self, url):
+        if url not in self.resolved_depths:
+            chain, node = self.unresolved_chain(url, self.resolved_depths)
+            depth = self.resolved_depths[node] if node else -1
+            for chain_node in reversed(chain):
+                depth += 1
+                self.resolved_depths[chain_node] = depth
+        return self.resolved_depths[url]
+
+    def to_paths(self):
+        return {url: self.path(url) for url in self.parents}
+
+    def to_compact(self):
+        nodes = {url: {'parent': parent, 'depth': self.depth(url)} for url, parent in self.parents.items()}
+        return {'format': COMPACT_FORMAT, 'version': COMPACT_FORMAT_VERSION, 'nodes': nodes}
@@ -0,0 +1,102 @@
+import asyncio
+import gzip
+import logging
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ElementTree
+from collections import deque
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+GZIP_MAGIC = b'\x1f\x8b'
+MAX_ROBOTS_BYTES = 512 * 1024
+
+
+def local_name(tag):
+    return tag.rpartition('}')[2]
+
+
+class SitemapSeeder:
+    def __init__(self, user_agent='DomainExplorer', max_urls=50000, max_sitemaps=100, timeout=15):
+        self.user_agent = user_agent
+        self.max_urls = max_urls
+        self.max_sitemaps = max_sitemaps
+        self.timeout = timeout
+
+    def origin(self, url):
+        parts = urlparse(url)
+        return '%s://%s' % (parts.scheme, parts.netloc)
+
+    def open(self, url):
+        request = urllib.request.Request(url, headers={'User-Agent': self.user_agent})
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def fetch_robots(self, start_url):
+        # Same status rules as RobotFileParser.read: 401/403 disallow everything, other errors allow everything
+        parser = RobotFileParser(self.origin(start_url) + '/robots.txt')
+        try:
+            with self.open(parser.url) as response:
+                lines = response.read(MAX_ROBOTS_BYTES).decode('utf-8', 'replace').splitlines()
+        except urllib.error.HTTPError as e:
+            if e.code in (401, 403):
+                parser.disallow_all = True
+            else:
+                parser.allow_all = True
+            return parser
+        except (urllib.error.URLError, OSError) as e:
+            logging.info('robots.txt of %s could not be read: %s', start_url, str(e))
+            parser.allow_all = True
+            return parser
+        parser.parse(lines)
+        return parser
+
+    def read_sitemap(self, sitemap_url, limit):
+        # Streams a sitemap or sitemap index, gzip-compressed or not, returning (page urls, nested sitemap urls)
+        page_urls = []
+        sitemap_urls = []
+        with self.open(sitemap_url) as response:
+            stream = gzip.GzipFile(fileobj=response) if response.peek(2)[:2] == GZIP_MAGIC else response
+            root = None
+            path = []
+            location = None
+            for event, element in ElementTree.iterparse(stream, events=('start', 'end')):
+                name = local_name(element.tag)
+                if event == 'start':
+                    if root is None:
+                        root = element
+                    path.append(name)
+                    continue
+                path.pop()
+                # Only <loc> directly inside <url> or <sitemap>, not image or video extension locations
+                if name == 'loc' and path and path[-1] in ('url', 'sitemap'):
+                    location = (element.text or '').strip()
+                elif name in ('url', 'sitemap'):
+                    if location:
+                        (page_urls if name == 'url' else sitemap_urls).append(location)
+                    location = None
+                    root.clear()  # Keeps memory flat on sitemaps with tens of thousands of entries
+                    if len(page_urls) >= limit:
+                        break
+        return page_urls, sitemap_urls
+
+    async def sitemaps(self, start_url, robots):
+        # Yields (sitemap url, url of the index that listed it or None, page urls) breadth first through indexes
+        loop = asyncio.get_running_loop()
+        site_maps = robots.site_maps() if robots else None
+        pending = deque((sitemap_url, None) for sitemap_url in site_maps or [self.origin(start_url) + '/sitemap.xml'])
+        seen = set()
+        page_count = 0
+        while pending and len(seen) < self.max_sitemaps and page_count < self.max_urls:
+            sitemap_url, index_url = pending.popleft()
+            if sitemap_url in seen:
+                continue
+            seen.add(sitemap_url)
+            try:
+                page_urls, sitemap_urls = await loop.run_in_executor(None, self.read_sitemap, sitemap_url,
+                                                                     self.max_urls - page_count)
+            except Exception as e:
+                logging.info('Sitemap %s could not be read: %s', sitemap_url, str(e))
+                continue
+            pending.extend((nested_url, sitemap_url) for nested_url in sitemap_urls)
+            page_count += len(page_urls)
+            yield sitemap_url, index_url, page_urls
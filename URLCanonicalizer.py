@@ -0,0 +1,97 @@
+import functools
+import re
+from fnmatch import fnmatch
+from urllib.parse import quote, unquote_plus, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+DEFAULT_RULES = {
+    # "routes" keeps hash-based SPA routes such as #/login or #!/login and drops in-page anchors,
+    # "all" keeps every fragment and "none" drops them all
+    'fragments': 'routes',
+    'sort_query': True,
+    'strip_parameters': ['utm_*', 'gclid', 'fbclid', 'msclkid', 'dclid', 'yclid', 'mc_cid', 'mc_eid', '_ga'],
+}
+UNRESERVED = re.compile(r'[A-Za-z0-9\-._~]')
+PERCENT_ESCAPE = re.compile(r'%([0-9A-Fa-f]{2})')
+PATH_SAFE = "/:@!$&'()*+,;=-._~%"
+
+
+def normalize_percent_encoding(value):
+    # Decodes escapes of unreserved characters, upper-cases the rest and escapes anything left unencoded
+    def replace(match):
+        character = chr(int(match.group(1), 16))
+        return character if UNRESERVED.match(character) else '%' + match.group(1).upper()
+    return quote(PERCENT_ESCAPE.sub(replace, value), safe=PATH_SAFE)
+
+
+class URLCanonicalizer:
+    def __init__(self, rules=None, cache_size=100000):
+        rules = rules or {}
+        self.default_rules = dict(DEFAULT_RULES, **rules.get('default', {}))
+        self.domain_rules = {domain.lower(): dict(self.default_rules, **domain_rules)
+                             for domain, domain_rules in rules.get('domains', {}).items()}
+        # Every discovered link goes through here, so results are memoized in a bounded LRU cache
+        self.canonicalize = functools.lru_cache(maxsize=cache_size)(self.canonicalize_uncached)
+
+    def rules_for(self, hostname):
+        while hostname:
+            if hostname in self.domain_rules:
+                return self.domain_rules[hostname]
+            hostname = hostname.partition('.')[2]
+        return self.default_rules
+
+    def canonicalize_uncached(self, url):
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in DEFAULT_PORTS:
+            return url
+        hostname = (parts.hostname or '').lower()
+        rules = self.rules_for(hostname)
+
+        # hostname drops the brackets of an IPv6 literal, which the URL needs to stay parseable
+        netloc = '[%s]' % hostname if ':' in hostname else hostname
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        if port and port != DEFAULT_PORTS[scheme]:
+            netloc += ':%d' % port
+        if parts.username:
+            netloc = parts.username + (':' + parts.password if parts.password else '') + '@' + netloc
+
+        path = normalize_percent_encoding(parts.path)
+        query = self.canonicalize_query(parts.query, rules)
+        fragment = self.canonicalize_fragment(parts.fragment, rules)
+
+        # The crawler's original rule of dropping the URL's trailing slash, kept so artifacts of earlier crawls stay
+        # comparable. It applies to whichever part ends the URL, and to all its trailing slashes so that the result
+        # canonicalizes to itself
+        fragment = fragment.rstrip('/')
+        if fragment == '!':
+            fragment = ''
+        if not fragment and not query:
+            path = path.rstrip('/')
+        return urlunsplit((scheme, netloc, path, query, fragment))
+
+    def canonicalize_query(self, query, rules):
+        # A bare key (?flag) stays bare, some servers and routers treat it differently from ?flag=
+        parameters = []
+        for field in query.split('&'):
+            if not field:
+                continue
+            name, separator, value = field.partition('=')
+            name = unquote_plus(name)
+            if any(fnmatch(name, pattern) for pattern in rules['strip_parameters']):
+                continue
+            parameters.append((name, unquote_plus(value) if separator else None))
+        if rules['sort_query']:
+            parameters.sort(key=lambda parameter: (parameter[0], parameter[1] is not None, parameter[1] or ''))
+        return '&'.join(quote(name, safe='') if value is None else quote(name, safe='') + '=' + quote(value, safe='')
+                        for name, value in parameters)
+
+    def canonicalize_fragment(self, fragment, rules):
+        if not fragment or rules['fragments'] == 'none':
+            return ''
+        if rules['fragments'] == 'routes' and not fragment.startswith(('/', '!/')):
+            return ''
+        return fragment
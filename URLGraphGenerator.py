@@ -1,14 +1,98 @@
-import jinja2
+import os
+from urllib.parse import urlparse
+
+from SequenceArtifact import SequenceArtifact
+
+LEVEL_SPACING = 150
+SIBLING_SPACING = 40
 
 
 class URLGraphGenerator:
-    def __init__(self, template_path):
+    def __init__(self, template_path, layout='auto', collapse_threshold=500, physics_threshold=2000):
         self.template_path = template_path
-        template_loader = jinja2.FileSystemLoader(searchpath="./templates")
+        import jinja2
+
+        template_loader = jinja2.FileSystemLoader(searchpath=os.path.dirname(template_path) or "./templates")
         template_env = jinja2.Environment(loader=template_loader)
-        self.template = template_env.get_template("report_template.html")
+        self.template = template_env.get_template(os.path.basename(template_path))
+        self.layout = layout
+        self.collapse_threshold = collapse_threshold
+        self.physics_threshold = physics_threshold
 
     def generate_graph(self, url_sequences, output_path):
-        html_output = self.template.render(url_sequences=url_sequences)
+        # Accepts a SequenceArtifact or the {url: path} map written to data/<domain>.json
+        if isinstance(url_sequences, SequenceArtifact):
+            artifact = url_sequences
+        else:
+            artifact = SequenceArtifact.from_paths(url_sequences)
+        graph = self.build_graph(artifact)
+        html_output = self.template.render(graph=graph)
         with open(output_path, "w") as f:
             f.write(html_output)
+
+    def build_graph(self, artifact):
+        urls = list(artifact.parents)
+        depths = {url: artifact.depth(url) for url in urls}
+        # The old template combined every path's consecutive pairs. Those pairs are exactly the parent pointers,
+        # and the number of paths crossing parent -> url is the size of the subtree below url.
+        subtree_sizes = dict.fromkeys(urls, 1)
+        tree_children = {}
+        for url in sorted(urls, key=depths.get, reverse=True):
+            parent = artifact.parents[url]
+            if parent and parent in depths and depths[parent] < depths[url]:
+                subtree_sizes[parent] += subtree_sizes[url]
+                tree_children.setdefault(parent, []).append(url)
+        edges = [{'from': artifact.parents[url], 'to': url, 'value': subtree_sizes[url]}
+                 for url in urls if artifact.parents[url] in depths and artifact.parents[url] != url]
+
+        nodes = [{'id': url, 'title': url, 'group': self.group_for(url)} for url in urls]
+        precomputed = self.layout == 'precomputed' or (self.layout == 'auto' and len(nodes) > self.physics_threshold)
+        if precomputed:
+            positions = self.tree_layout(urls, depths, tree_children)
+            for node in nodes:
+                node['x'], node['y'] = positions[node['id']]
+
+        clusters = {}
+        if len(nodes) > self.collapse_threshold:
+            for node in nodes:
+                clusters.setdefault(node['group'], []).append(node)
+            clusters = {group: self.cluster_node(group, members, precomputed)
+                        for group, members in clusters.items() if len(members) > 1}
+        return {'nodes': nodes, 'edges': edges, 'clusters': clusters, 'physics': not precomputed}
+
+    def group_for(self, url):
+        # Hash routes are the paths of single page apps, so #/customer/1 is grouped like /customer/1
+        parsed = urlparse(url)
+        path = parsed.fragment if parsed.fragment.startswith(('/', '!/')) else parsed.path
+        segments = [segment for segment in path.lstrip('!').split('/') if segment]
+        return parsed.netloc + '/' + (segments[0] if segments else '')
+
+    def cluster_node(self, group, members, precomputed):
+        cluster = {'id': 'cluster:' + group, 'label': '%s (%d)' % (group, len(members)), 'size': len(members)}
+        if precomputed:
+            cluster['x'] = sum(member['x'] for member in members) / len(members)
+            cluster['y'] = sum(member['y'] for member in members) / len(members)
+        return cluster
+
+    def tree_layout(self, urls, depths, tree_children):
+        # Leaves get consecutive columns in depth-first order and every parent is centred over its children
+        positions = {}
+        next_column = 0
+        has_parent = {child for children in tree_children.values() for child in children}
+        roots = [url for url in urls if url not in has_parent]
+        for root in roots:
+            stack = [(root, False)]
+            while stack:
+                url, children_done = stack.pop()
+                children = tree_children.get(url, [])
+                if children and not children_done:
+                    stack.append((url, True))
+                    stack.extend((child, False) for child in reversed(children))
+                    continue
+                if children:
+                    x = sum(positions[child][0] for child in children) / len(children)
+                else:
+                    x = next_column * SIBLING_SPACING
+                    next_column += 1
+                positions[url] = (x, depths[url] * LEVEL_SPACING)
+        return positions
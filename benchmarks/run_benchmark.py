@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from tabulate import tabulate
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from synthetic_site import SITE_KINDS, SyntheticSite  # noqa: E402
+
+ENGINES = ['pyppeteer', 'scrapy']
+RESULT_PREFIX = 'BENCHMARK_RESULT '
+
+# Every optional crawler feature is set here, so results only change when the benchmark does, not the repo config
+BENCHMARK_CONFIG = {
+    'max_open_pages': 8,
+    'hybrid': False,
+    'static_routes': False,
+    'sitemaps': {'enabled': False},
+    'robots_txt': {'obey': False},
+    'artifact_format': 'paths',
+    'frontier': {},
+    'settle_timeout': 3,
+    'settle_quiet_period': 0.5,
+    'request_blocking': {'enabled': False},
+    'auto_throttle': {'enabled': False},
+    'host_health': {'enabled': True},
+    'retries': {'max_retries': 2},
+    'compact_state': {'enabled': False},
+    'canonicalization': {},
+}
+SCENARIO_CONFIG = {
+    'static': {},
+    'angular': {},
+    # Slow pages are slow on purpose, they must not be retried or pause the host
+    'slow': {'host_health': {'enabled': False, 'default_timeout': 15}, 'retries': {'max_retries': 0}},
+}
+
+
+def run_pyppeteer(start_url, tabs, site):
+    from pyppeteer_spider_bfs import PyppeteerSpider
+
+    with open(os.path.join(REPO_DIR, 'config.json')) as f:
+        chrome_path = json.load(f).get('chrome_path')
+    config = dict(BENCHMARK_CONFIG, **SCENARIO_CONFIG[site])
+    config.update({'start_urls': [start_url], 'chrome_path': chrome_path, 'headless': 'true', 'tabs': tabs})
+    # A fresh profile that is closed with the crawl, so no run starts warm or leaves a browser behind
+    config['browser_pool'] = {'user_data_dir': os.path.abspath(os.path.join('data', 'browser_profiles')),
+                              'keep_alive': False, 'isolated_contexts': False}
+    config['checkpoint'] = {'path': os.path.join('data', 'checkpoints.db')}
+    config['metrics'] = {'trace_path': os.path.join('data', 'crawl_trace.jsonl')}
+    with open('config.json', 'w') as f:
+        json.dump(config, f)
+
+    spider = PyppeteerSpider(config_path='config.json')
+    start = time.perf_counter()
+    asyncio.run(spider.crawl_website())
+    elapsed = time.perf_counter() - start
+    return sum(spider.metrics.pages.values()), elapsed, spider.metrics.phase_totals()
+
+
+def run_scrapy(start_url):
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.settings import Settings
+    from DomainExplorer.spiders.spider import Spider
+
+    settings = Settings()
+    settings.setmodule('DomainExplorer.settings', priority='project')
+    settings.set('LOG_LEVEL', 'WARNING')
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(Spider)
+    start = time.perf_counter()
+    process.crawl(crawler, start_urls=[start_url])
+    process.start()
+    elapsed = time.perf_counter() - start
+    pages = crawler.stats.get_value('response_received_count', 0)
+    return pages, elapsed, {}
+
+
+def worker_peak_rss_kb():
+    # The worker's own peak, without the browser. resource does not exist on Windows
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # Bytes on macOS, kilobytes on Linux
+
+
+def run_worker(engine, start_url, tabs, site):
+    # Runs inside a subprocess with a scratch working directory, so artifacts never touch the repo
+    os.makedirs('data', exist_ok=True)
+    os.makedirs('reports', exist_ok=True)
+    if engine == 'pyppeteer':
+        pages, elapsed, phase_times = run_pyppeteer(start_url, tabs, site)
+    else:
+        pages, elapsed, phase_times = run_scrapy(start_url)
+    result = {'pages': pages, 'elapsed': elapsed, 'phases': phase_times, 'worker_rss_kb': worker_peak_rss_kb()}
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+def sample_tree_rss(pid, stop, peak):
+    # Sums the RSS of the worker and every process below it (Chrome and its renderers) and keeps the highest sum
+    import psutil
+
+    try:
+        root = psutil.Process(pid)
+    except psutil.NoSuchProcess:
+        return
+    while not stop.is_set():
+        try:
+            processes = [root] + root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        peak[0] = max(peak[0], total)
+        stop.wait(0.2)
+
+
+def run_engine(engine, start_url, tabs, site):
+    try:
+        import psutil  # noqa: F401
+        has_psutil = True
+    except ImportError:
+        has_psutil = False
+    peak = [0]
+    stop = threading.Event()
+    with tempfile.TemporaryDirectory() as work_dir:
+        worker = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--worker', engine, '--url', start_url, '--tabs', str(tabs),
+             '--site', site],
+            cwd=work_dir, stdout=subprocess.PIPE, text=True
+        )
+        sampler = None
+        if has_psutil:
+            sampler = threading.Thread(target=sample_tree_rss, args=(worker.pid, stop, peak), daemon=True)
+            sampler.start()
+        output = worker.communicate()[0]
+        stop.set()
+        if sampler:
+            sampler.join()
+    if worker.returncode:
+        raise RuntimeError('%s benchmark exited with status %d' % (engine, worker.returncode))
+    result = None
+    for line in output.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line[len(RESULT_PREFIX):])
+    if result is None:
+        raise RuntimeError('%s benchmark produced no result' % engine)
+    if has_psutil:
+        result['peak_rss_kb'] = peak[0] // 1024
+        result['rss_scope'] = 'process tree'
+    else:
+        result['peak_rss_kb'] = result['worker_rss_kb']
+        result['rss_scope'] = 'worker only'
+    result['engine'] = engine
+    result['pages_per_second'] = result['pages'] / result['elapsed'] if result['elapsed'] else 0.0
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the crawlers against a local synthetic site')
+    parser.add_argument('--site', choices=SITE_KINDS, default='static')
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--slow-fraction', type=float, default=0.2, help='share of slow pages on the slow site')
+    parser.add_argument('--slow-latency', type=float, default=2.0, help='extra seconds for each slow page')
+    parser.add_argument('--engine', choices=ENGINES + ['all'], default='all')
+    parser.add_argument('--tabs', type=int, default=4)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--worker', choices=ENGINES, help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        logging.basicConfig(level=logging.WARNING)
+        run_worker(args.worker, args.url, args.tabs, args.site)
+        return
+
+    site = SyntheticSite(args.site, args.pages, args.fanout, args.latency, args.slow_fraction, args.slow_latency)
+    start_url = site.start()
+    engines = list(ENGINES) if args.engine == 'all' else [args.engine]
+    if args.site == 'angular' and 'scrapy' in engines:
+        engines.remove('scrapy')  # Hash routes only exist in a browser
+    results = []
+    try:
+        for engine in engines:
+            results.append(run_engine(engine, start_url, args.tabs, args.site))
+    finally:
+        site.stop()
+
+    phases = sorted({phase for result in results for phase in result['phases']})
+    headers = ['Engine', 'Pages', 'Seconds', 'Pages/sec', 'Peak RSS (MB)'] + ['%s (s)' % phase for phase in phases]
+    rows = [[result['engine'], result['pages'], '%.2f' % result['elapsed'], '%.2f' % result['pages_per_second'],
+             'n/a' if result['peak_rss_kb'] is None else '%.1f (%s)' % (result['peak_rss_kb'] / 1024,
+                                                                       result['rss_scope'])]
+            + ['%.2f' % result['phases'].get(phase, 0.0) for phase in phases]
+            for result in results]
+    print(tabulate(rows, headers=headers, tablefmt='pretty'))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'site': vars(args), 'results': results}, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SITE_KINDS = ['static', 'angular', 'slow']
+
+PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head><title>{title}</title></head>
+<body>
+<h1>{title}</h1>
+<p>Synthetic benchmark page generated by DomainExplorer.</p>
+<ul>
+{links}
+</ul>
+</body>
+</html>
+'''
+
+# A dependency-free stand-in for an AngularJS app: hash routes rendered in the browser, navigated with ng-click
+ANGULAR_TEMPLATE = '''<!DOCTYPE html>
+<html ng-app="benchmark">
+<head><title>Synthetic SPA</title></head>
+<body>
+<div ng-view id="view"></div>
+<script>
+const children = {children};
+function render() {{
+    const match = /#\\/route\\/(\\d+)/.exec(window.location.hash);
+    const route = match ? Number(match[1]) : 0;
+    const view = document.getElementById('view');
+    view.innerHTML = '<h1>Route ' + route + '</h1>';
+    for (const child of children[route] || []) {{
+        const button = document.createElement('button');
+        button.setAttribute('ng-click', "go('" + child + "')");
+        button.textContent = 'Route ' + child;
+        view.appendChild(button);
+    }}
+}}
+document.addEventListener('click', (event) => {{
+    const target = event.target.closest('[ng-click]');
+    const match = target && /go\\('(\\d+)'\\)/.exec(target.getAttribute('ng-click'));
+    if (match) {{
+        window.location.hash = '#/route/' + match[1];
+    }}
+}});
+window.addEventListener('hashchange', render);
+render();
+</script>
+</body>
+</html>
+'''
+
+
+class SyntheticSite:
+    def __init__(self, kind='static', pages=100, fanout=5, latency=0.0, slow_fraction=0.2, slow_latency=2.0,
+                 seed=1):
+        if kind not in SITE_KINDS:
+            raise ValueError('Unknown site kind: %s' % kind)
+        self.kind = kind
+        self.pages = pages
+        self.fanout = fanout
+        self.latency = latency
+        self.slow_fraction = slow_fraction if kind == 'slow' else 0.0
+        self.slow_latency = slow_latency
+        # Page i links to its children fanout * i + 1 .. fanout * i + fanout, a tree of the requested size
+        self.children = [[child for child in range(fanout * page + 1, fanout * page + fanout + 1) if child < pages]
+                         for page in range(pages)]
+        generator = random.Random(seed)
+        self.slow_pages = {page for page in range(pages) if generator.random() < self.slow_fraction}
+        self.server = None
+        self.thread = None
+
+    @property
+    def start_url(self):
+        host, port = self.server.server_address[:2]
+        if self.kind == 'angular':
+            return 'http://%s:%d/#/route/0' % (host, port)
+        return 'http://%s:%d/page/0' % (host, port)
+
+    def render(self, path):
+        # Returns (status, delay, body) for a request path
+        if self.kind == 'angular':
+            if path in ('/', '/index.html'):
+                return 200, self.latency, ANGULAR_TEMPLATE.format(children=self.children)
+            return 404, self.latency, 'Not found'
+        if not path.startswith('/page/') or not path[len('/page/'):].isdigit():
+            return 404, self.latency, 'Not found'
+        page = int(path[len('/page/'):])
+        if page >= self.pages:
+            return 404, self.latency, 'Not found'
+        links = ['<li><a href="/page/%d">Page %d</a></li>' % (child, child) for child in self.children[page]]
+        if page:
+            links.append('<li><a href="/page/%d">Parent</a></li>' % ((page - 1) // self.fanout))
+        delay = self.latency + (self.slow_latency if page in self.slow_pages else 0.0)
+        return 200, delay, PAGE_TEMPLATE.format(title='Page %d' % page, links='\n'.join(links))
+
+    def handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, delay, body = site.render(self.path.split('?')[0])
+                if delay:
+                    time.sleep(delay)
+                payload = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self, host='127.0.0.1', port=0):
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.start_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
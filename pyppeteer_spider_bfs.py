@@ -1,189 +1,814 @@
+import argparse
 import asyncio
+import contextlib
+import hashlib
+import heapq
 import json
 import logging
 import os
 import re
 import time
 from urllib.parse import urlparse, urljoin
-from pyppeteer import launch
-from tabulate import tabulate
+from AutoThrottle import AutoThrottle, is_healthy_status
+from BrowserPool import BrowserPool
+from CrawlCheckpoint import CrawlCheckpoint
+from CrawlMetrics import CrawlMetrics
+from CrawlSession import CrawlSession
+from EdgeStream import EdgeStream
+from HostHealth import HostHealth
+from HttpFetcher import HttpFetcher
+from PageFingerprinter import PageFingerprinter
+from PageSettleDetector import PageSettleDetector
+from RequestBlocker import RequestBlocker
+from RouteExtractor import RouteExtractor
+from RouteRecorder import RouteRecorder
+from SequenceArtifact import SequenceArtifact
+from SitemapSeeder import SitemapSeeder
+from URLCanonicalizer import URLCanonicalizer
 from URLGraphGenerator import URLGraphGenerator
 
+# Collects every link target on the page in one round trip, resolved against the document base URL
+EXTRACT_LINKS_JS = '''() => {
+    const links = new Set();
+    for (const anchor of document.querySelectorAll('a[href]')) {
+        if (anchor.href) {
+            links.add(anchor.href);
+        }
+    }
+    for (const attribute of ['ng-href', 'routerLink', 'data-href']) {
+        for (const element of document.querySelectorAll(`[${attribute}]`)) {
+            const value = element.getAttribute(attribute);
+            if (!value || value.includes('{{')) {
+                continue;
+            }
+            try {
+                links.add(new URL(value, document.baseURI).href);
+            } catch (e) {}
+        }
+    }
+    return Array.from(links);
+}'''
+
+CLICK_ATTRIBUTES = ['ng-click', 'click', 'onClick']
+# Trace statuses of visits that go to the retry queue
+RETRY_STATUSES = ('navigation_timeout', 'navigation_error', 'server_error', 'error')
+
+# Lists every clickable candidate with a structural selector, its click expression and viewport visibility
+SCAN_CLICKABLE_JS = '''(attributes) => {
+    const cssPath = (element) => {
+        const parts = [];
+        while (element && element !== document.documentElement) {
+            if (element.id) {
+                parts.unshift('#' + CSS.escape(element.id));
+                break;
+            }
+            let index = 1;
+            for (let sibling = element.previousElementSibling; sibling; sibling = sibling.previousElementSibling) {
+                if (sibling.tagName === element.tagName) {
+                    index++;
+                }
+            }
+            parts.unshift(`${element.tagName.toLowerCase()}:nth-of-type(${index})`);
+            element = element.parentElement;
+        }
+        return parts.join(' > ');
+    };
+    const candidates = [];
+    const selector = attributes.map(attribute => `[${attribute}]`).join(', ');
+    for (const element of document.querySelectorAll(selector)) {
+        const attribute = attributes.find(name => element.getAttribute(name));
+        if (!attribute) {
+            continue;
+        }
+        const rect = element.getBoundingClientRect();
+        const visible = rect.width > 0 && rect.height > 0 && rect.bottom > 0 && rect.right > 0 &&
+            rect.top < window.innerHeight && rect.left < window.innerWidth;
+        candidates.push({selector: cssPath(element), clickFunction: element.getAttribute(attribute), visible: visible});
+    }
+    return candidates;
+}'''
+
+# Clicks a scanned candidate only if the selector still points at an element with the same click expression
+CLICK_CANDIDATE_JS = '''(selector, clickFunction, attributes) => {
+    const element = document.querySelector(selector);
+    if (!element || !attributes.some(attribute => element.getAttribute(attribute) === clickFunction)) {
+        return false;
+    }
+    element.dispatchEvent(new MouseEvent('click', {bubbles: true, cancelable: true, view: window}));
+    return true;
+}'''
+
 
 class PyppeteerSpider:
-    def __init__(self):
+    def __init__(self, resume=False, incremental=False, config_path="config.json"):
         self.chrome_path = None
         self.headless = False
         self.start_urls = None
-        self.load_config("config.json")
-        self.visited_urls = set()
-        self.sequence = {}
-        self.executed_functions = set()
+        self.tabs = 1
+        self.settle_timeout = 3
+        self.settle_quiet_period = 0.5
+        self.request_blocker = None
+        self.http_fetcher = None
+        self.route_extractor = None
+        self.sitemap_seeder = None
+        self.throttle = None
+        self.host_health = None
+        self.navigation_timeout_seconds = 15
+        self.max_retries = 2
+        self.retry_backoff = 10
+        self.retry_max_backoff = 300
+        self.use_sitemaps = False
+        self.obey_robots = False
+        self.browser_pool = None
+        self.isolated_contexts = True
+        self.frontier_priorities = {}
+        self.max_depth = None
+        self.max_pages = None
+        self.max_seconds = None
+        self.checkpoint_path = os.path.join("data", "checkpoints.db")
+        self.checkpoint_interval = 25
+        self.max_open_pages = 8
+        self.visits_per_slot = 20
+        self.artifact_format = 'paths'
+        self.report_options = {}
+        self.canonicalizer = URLCanonicalizer()
+        self.compact_state = None
+        self.metrics = CrawlMetrics()
+        self.config_path = config_path
+        self.load_config(config_path)
+        self.resume = resume
+        self.incremental = incremental
+        self.checkpoint = None
         self.browser = None
-        self.page = None
-        self.pending_urls = set()
+        self.page_slots = None
+        self.settle_detectors = {}
+        self.fingerprinters = {}
+        self.route_recorders = {}
+        self.page_traces = {}
         current_dir = os.path.dirname(os.path.abspath(__file__))
         template_path = os.path.join(current_dir, "templates", "report_template.html")
-        self.report_generator = URLGraphGenerator(template_path)
+        self.report_generator = URLGraphGenerator(template_path, **self.report_options)
 
     def load_config(self, config_path):
         with open(config_path) as f:
             config = json.load(f)
             self.chrome_path = config.get('chrome_path')
             self.start_urls = config.get('start_urls', [])
+            self.tabs = max(1, int(config.get('tabs', 1)))
+            self.max_open_pages = max(1, int(config.get('max_open_pages', self.max_open_pages)))
+            self.artifact_format = config.get('artifact_format', self.artifact_format)
+            self.report_options = config.get('report', {})
+            canonicalization = config.get('canonicalization', {})
+            self.canonicalizer = URLCanonicalizer(canonicalization, int(canonicalization.get('cache_size', 100000)))
+            self.settle_timeout = float(config.get('settle_timeout', 3))
+            self.settle_quiet_period = float(config.get('settle_quiet_period', 0.5))
+            request_blocking = config.get('request_blocking', {})
+            if request_blocking.get('enabled'):
+                self.request_blocker = RequestBlocker(request_blocking.get('resource_types'),
+                                                      request_blocking.get('hosts'))
+            if config.get('hybrid'):
+                self.http_fetcher = HttpFetcher()
+            if config.get('static_routes'):
+                self.route_extractor = RouteExtractor()
+            sitemaps = config.get('sitemaps', {})
+            robots_txt = config.get('robots_txt', {})
+            self.use_sitemaps = bool(sitemaps.get('enabled'))
+            self.obey_robots = bool(robots_txt.get('obey'))
+            if self.use_sitemaps or self.obey_robots:
+                self.sitemap_seeder = SitemapSeeder(robots_txt.get('user_agent', 'DomainExplorer'),
+                                                    int(sitemaps.get('max_urls', 50000)),
+                                                    int(sitemaps.get('max_sitemaps', 100)))
+            compact_state = config.get('compact_state', {})
+            if compact_state.get('enabled'):
+                self.compact_state = compact_state
+            metrics = config.get('metrics', {})
+            self.metrics = CrawlMetrics(metrics.get('trace_path'), metrics.get('prometheus_path'),
+                                        metrics.get('prometheus_port'), float(metrics.get('flush_interval', 5)),
+                                        float(metrics.get('throughput_window', 60)))
+            checkpoint = config.get('checkpoint', {})
+            self.checkpoint_path = checkpoint.get('path', self.checkpoint_path)
+            self.checkpoint_interval = max(1, int(checkpoint.get('interval', self.checkpoint_interval)))
             if config.get('headless').lower() == "true":
                 self.headless = True
             else:
                 self.headless = False
+            auto_throttle = config.get('auto_throttle', {})
+            if auto_throttle.get('enabled'):
+                self.throttle = AutoThrottle(
+                    float(auto_throttle.get('start_delay', 0)), float(auto_throttle.get('min_delay', 0)),
+                    float(auto_throttle.get('max_delay', 30)), float(auto_throttle.get('target_concurrency', 2)),
+                    int(auto_throttle.get('min_concurrency', 1)), int(auto_throttle.get('max_concurrency', self.tabs)),
+                    float(auto_throttle.get('error_threshold', 0.2))
+                )
+            host_health = config.get('host_health', {})
+            self.navigation_timeout_seconds = float(host_health.get('default_timeout', 15))
+            if host_health.get('enabled'):
+                self.host_health = HostHealth(
+                    self.navigation_timeout_seconds, float(host_health.get('min_timeout', 5)),
+                    float(host_health.get('max_timeout', 30)), float(host_health.get('percentile', 95)),
+                    float(host_health.get('multiplier', 3)),
+                    failure_threshold=int(host_health.get('failure_threshold', 5)),
+                    cooldown=float(host_health.get('cooldown', 30)),
+                    max_cooldown=float(host_health.get('max_cooldown', 600))
+                )
+            retries = config.get('retries', {})
+            self.max_retries = int(retries.get('max_retries', self.max_retries))
+            self.retry_backoff = float(retries.get('backoff', self.retry_backoff))
+            self.retry_max_backoff = float(retries.get('max_backoff', self.retry_max_backoff))
+            frontier = config.get('frontier', {})
+            self.frontier_priorities = frontier.get('priorities', {})
+            self.max_depth = frontier.get('max_depth')
+            self.max_pages = frontier.get('max_pages')
+            self.max_seconds = frontier.get('max_seconds')
+            browser_pool = config.get('browser_pool', {})
+            self.browser_pool = BrowserPool(self.chrome_path, self.headless, browser_pool.get('user_data_dir'),
+                                            bool(browser_pool.get('keep_alive')))
+            self.isolated_contexts = bool(browser_pool.get('isolated_contexts', True))
 
-    def save_sequence_as_artifact(self, domain, sequence_map):
+    def save_sequence_as_artifact(self, domain, artifact):
         file_path = os.path.join("data", domain + ".json")
         with open(file_path, "w") as f:
-            json.dump(sequence_map, f, indent=4)
+            if self.artifact_format == 'compact':
+                # Parent pointers and depths only, readers expand paths on demand with SequenceArtifact.load
+                json.dump(artifact.to_compact(), f)
+            else:
+                json.dump(artifact.to_paths(), f, indent=4)
+
+    def load_fingerprints(self, domain):
+        file_path = os.path.join("data", domain + ".fingerprints.json")
+        if not os.path.exists(file_path):
+            return {}
+        with open(file_path) as f:
+            return json.load(f)
+
+    def save_fingerprints(self, session):
+        fingerprints = {}
+        for url, fingerprint in session.page_fingerprints.items():
+            fingerprints[url] = {
+                'fingerprint': fingerprint,
+                'children': sorted(session.page_children.get(url, ())),
+            }
+        file_path = os.path.join("data", session.domain + ".fingerprints.json")
+        with open(file_path, "w") as f:
+            json.dump(fingerprints, f, indent=4)
+
+    def edge_stream_path(self, domain):
+        return os.path.join("data", domain + ".edges.jsonl")
 
     def normalize_url(self, url):
-        if url.endswith('/'):
-            url = url[:-1]
-        if url.endswith('/#'):
-            url = url[:-2]
-        return url
+        return self.canonicalizer.canonicalize(url)
+
+    async def launch_browser(self, slot=0):
+        self.browser = await self.browser_pool.acquire(slot)
+
+    async def close_browser(self, slot=0):
+        await self.browser_pool.release(self.browser, slot)
+
+    async def open_context(self):
+        if self.isolated_contexts:
+            # Each start URL gets its own cookies, storage and cache so apps cannot see each other's state
+            return await self.browser.createIncognitoBrowserContext()
+        # The profile's own context, whose disk cache persists in the browser pool's user data directory
+        return self.browser.browserContexts[0]
+
+    async def close_context(self, context):
+        if self.isolated_contexts:
+            await context.close()
 
     async def crawl_website(self):
-        if self.headless:
-            self.browser = await launch(executablePath=self.chrome_path)
-        else:
-            self.browser = await launch(headless=False, executablePath=self.chrome_path)
-        pages = await self.browser.pages()
-        self.page = pages[0]
-        await self.page.setJavaScriptEnabled(True)
+        await self.launch_browser()
+
+        self.checkpoint = CrawlCheckpoint(self.checkpoint_path)
+        self.page_slots = asyncio.Semaphore(self.max_open_pages)
+        self.metrics.open()
 
         logging.basicConfig(level=logging.INFO)
 
-        for url in self.start_urls:
-            start_time = time.time()
-
-            self.visited_urls = set()
-            self.sequence = {}
-            self.executed_functions = set()
-            self.pending_urls = set()
-            normalized_url = self.normalize_url(url)
-            self.pending_urls.add(normalized_url)
-            self.sequence[normalized_url] = None  # Add an initial entry to the sequence dictionary
-            domain = urlparse(normalized_url).netloc
+        results = await asyncio.gather(*[self.crawl_start_url(url) for url in self.start_urls],
+                                       return_exceptions=True)
+        for url, result in zip(self.start_urls, results):
+            if isinstance(result, Exception):
+                logging.error('Crawl of %s failed: %s', url, str(result))
+        if self.request_blocker:
+            logging.info('Blocked %d asset and tracker requests', self.request_blocker.blocked_count)
+        self.checkpoint.close()
+        self.metrics.close()
+        await self.close_browser()
+
+    def start_session(self, url):
+        session = CrawlSession(url, self.normalize_url(url), self.compact_state, self.frontier_priorities)
+        session.previous_fingerprints = self.load_fingerprints(session.domain) if self.incremental else {}
+        checkpoint_state = self.checkpoint.load(url) if self.resume else None
+        if checkpoint_state and checkpoint_state['completed']:
+            logging.info('Skipping %s, its crawl already completed', url)
+            return None
+        # A resumed crawl keeps appending to the edges streamed before it was interrupted
+        edge_stream_path = self.edge_stream_path(session.domain)
+        stream_exists = os.path.exists(edge_stream_path)
+        session.edge_stream = EdgeStream(edge_stream_path, append=bool(checkpoint_state))
+        if checkpoint_state:
+            session.restore(checkpoint_state)
+            if not stream_exists:
+                for sequence_url, parent_url in session.sequence.items():
+                    session.edge_stream.write(sequence_url, parent_url, 'checkpoint')
+            logging.info('Resuming %s with %d visited and %d pending URLs', url, len(session.visited_urls),
+                         len(session.pending_urls))
+        else:
+            self.checkpoint.reset(url)
+            session.seed()
+            session.edge_stream.write(session.normalized_start_url, None, 'start')
+        return session
+
+    async def crawl_start_url(self, url):
+        start_time = time.time()
+
+        session = self.start_session(url)
+        if session is None:
+            return
+        session.context = await self.open_context()
+        crawl_failed = False
+        try:
+            if self.sitemap_seeder:
+                await self.seed_frontier(session)
+            await self.bfs_crawl(session)
+        except Exception as e:
+            logging.error('Crawl Error: %s', str(e))
+            self.save_checkpoint(session)
+            logging.info('Saved a checkpoint for %s, run again with --resume to continue', url)
+            crawl_failed = True
+        finally:
+            await self.close_context(session.context)
+        self.finish_session(session, start_time, crawl_failed)
+
+    def finish_session(self, session, start_time, crawl_failed):
+        # The artifacts are built from the streamed edges, the same file a live consumer tails
+        session.edge_stream.close()
+        logging.info('Streamed %d edges to %s', session.edge_stream.edge_count, session.edge_stream.file_path)
+        artifact = SequenceArtifact(EdgeStream.load_parents(session.edge_stream.file_path))
+        from tabulate import tabulate
+        visited_data = [(url, artifact.parents.get(url, '')) for url in session.visited_urls]
+        headers = ['Visited URL', 'Parent URL']
+        table = tabulate(visited_data, headers=headers, tablefmt='pretty')
+        end_time = time.time()
+        elapsed_time = end_time - start_time
+        logging.info('Crawling %s completed in %.2f seconds. Visited URLs:\n%s', session.domain, elapsed_time, table)
+        logging.info('Time per phase for %s: %s', session.domain, self.metrics.summary(session.domain))
+
+        self.save_sequence_as_artifact(session.domain, artifact)
+        if self.incremental:
+            self.save_fingerprints(session)
+        file_path = os.path.join("reports", session.domain + ".html")
+        self.report_generator.generate_graph(artifact, file_path)
+
+        # Every full path of a large crawl is a lot of text, compact artifacts leave them to SequenceArtifact.load
+        if self.artifact_format != 'compact' and logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("URL Sequences:")
+            for sequence_url in artifact.parents:
+                logging.debug("%s: %s", sequence_url, " -> ".join(artifact.path(sequence_url)))
+        if not crawl_failed:
+            self.checkpoint.mark_completed(session.start_url)
+
+    async def seed_frontier(self, session):
+        loop = asyncio.get_running_loop()
+        robots = await loop.run_in_executor(None, self.sitemap_seeder.fetch_robots, session.start_url)
+        if self.obey_robots:
+            session.robots = robots
+        if not self.use_sitemaps or session.resumed:
+            return  # A resumed crawl already has the sitemap URLs in its frontier
+        sitemap_count = 0
+        queued_count = 0
+        async for sitemap_url, index_url, page_urls in self.sitemap_seeder.sitemaps(session.start_url, robots):
+            sitemap_count += 1
+            # Sitemaps become nodes of the crawl graph, so every URL they list has its sitemap as the parent
+            normalized_sitemap_url = self.normalize_url(sitemap_url)
+            parent_url = self.normalize_url(index_url) if index_url else session.normalized_start_url
+            if normalized_sitemap_url not in session.sequence:
+                session.set_parent(normalized_sitemap_url, parent_url)
+                session.edge_stream.write(normalized_sitemap_url, parent_url, 'sitemap')
+            for page_url in page_urls:
+                if self.queue_url(page_url, normalized_sitemap_url, session, 'sitemap'):
+                    queued_count += 1
+        logging.info('Queued %d URLs from %d sitemaps of %s', queued_count, sitemap_count, session.domain)
+
+    def save_checkpoint(self, session):
+        # Only what changed since the previous checkpoint is written. Pages that are still being visited or wait for
+        # a retry have not finished, so they stay pending and a resumed crawl visits them again
+        session.pages_since_checkpoint = 0
+        new_functions = session.executed_functions - session.checkpointed_functions
+        self.checkpoint.save(session.start_url, session.changed_parents, session.queued_urls, session.finished_urls,
+                             new_functions)
+        session.checkpointed_functions |= new_functions
+        session.changed_parents = {}
+        session.queued_urls = set()
+        session.finished_urls = set()
+
+    async def bfs_crawl(self, session):
+        session.active_visits = 0
+        workers = [asyncio.ensure_future(self.crawl_worker(session)) for _ in range(self.tabs)]
+        try:
+            await asyncio.gather(*workers)
+            if session.pending_urls and self.budget_exhausted(session):
+                logging.info('Stopped %s at its crawl budget with %d URLs left in the frontier', session.domain,
+                             len(session.pending_urls))
+        except Exception:
+            # Stop the remaining tabs so the frontier does not change while the checkpoint is written
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+    async def crawl_worker(self, session):
+        # The slot caps the number of open pages across all start URLs crawled at the same time. It is held for a
+        # batch of visits and then handed on, so every domain makes progress when there are more than the cap allows
+        while True:
+            if self.budget_exhausted(session):
+                return
+            self.release_retries(session)
+            if not session.pending_urls:
+                # Another tab may still discover links, so only stop once every tab is idle and no retry is waiting
+                if session.active_visits == 0 and not session.retry_urls:
+                    return
+                await asyncio.sleep(0.1)
+                continue
+            async with self.page_slots:
+                if not session.pending_urls:
+                    continue
+                page = await self.open_page(session.context)
+                try:
+                    await self.crawl_pending_urls(page, session, self.visits_per_slot)
+                finally:
+                    await self.close_page(page)
+
+    async def open_page(self, context):
+        page = await context.newPage()
+        await page.setJavaScriptEnabled(True)
+        self.settle_detectors[page] = PageSettleDetector(page, self.settle_timeout, self.settle_quiet_period)
+        self.route_recorders[page] = RouteRecorder(page)
+        await self.route_recorders[page].attach()
+        if self.request_blocker:
+            await self.request_blocker.attach(page)
+            if self.browser_pool.user_data_dir:
+                # Interception turns the cache off, turn it back on so the persistent profile cache is used
+                await page.setCacheEnabled(True)
+        if self.incremental:
+            self.fingerprinters[page] = PageFingerprinter(page)
+        if self.route_extractor:
+            self.route_extractor.attach(page)
+        return page
+
+    async def close_page(self, page):
+        del self.settle_detectors[page]
+        del self.route_recorders[page]
+        self.fingerprinters.pop(page, None)
+        if self.route_extractor:
+            self.route_extractor.detach(page)
+        await page.close()
+
+    def budget_exhausted(self, session):
+        # Unvisited URLs stay in the sequence, so a crawl stopped here still yields a graph of everything it found
+        if self.max_pages and len(session.visited_urls) >= self.max_pages:
+            return True
+        return bool(self.max_seconds) and time.time() - session.started_at >= self.max_seconds
+
+    async def crawl_pending_urls(self, page, session, max_visits):
+        # Returns after max_visits visits, or as soon as the frontier is empty
+        visits = 0
+        while visits < max_visits:
+            if self.budget_exhausted(session):
+                break
+            self.release_retries(session)
+            if not session.pending_urls:
+                break
+            normalized_url = session.pending_urls.pop()  # The frontier only holds canonical URLs
+            if normalized_url in session.visited_urls:
+                self.metrics.increment(session.domain, 'duplicates_skipped')
+                continue
+            if not self.is_same_domain(normalized_url, session.domain):
+                continue
+            session.visited_urls.add(normalized_url)
+            if self.circuit_open(session, normalized_url):
+                continue
+            session.in_progress_urls.add(normalized_url)
+            session.active_visits += 1
+            visits += 1
             try:
-                await self.bfs_crawl(domain)
+                status = (await self.visit_page(page, normalized_url, session)).status
             except Exception as e:
-                print(e)
-                await self.browser.close()
-
-            visited_data = [(url, self.sequence.get(url, '')) for url in self.visited_urls]
-            headers = ['Visited URL', 'Parent URL']
-            table = tabulate(visited_data, headers=headers, tablefmt='pretty')
-            end_time = time.time()
-            elapsed_time = end_time - start_time
-            logging.info('Crawling completed in %.2f seconds. Visited URLs:\n%s', elapsed_time, table)
-
-            sequence_map = self.map_sequence()
-            self.save_sequence_as_artifact(domain, sequence_map)
-            file_path = os.path.join("reports", domain + ".html")
-            self.report_generator.generate_graph(sequence_map, file_path)
-
-            logging.info("URL Sequences:")
-            for sequence_url in sequence_map:
-                path = " -> ".join(sequence_map[sequence_url])
-                logging.info("%s: %s", sequence_url, path)
-        await self.browser.close()
-
-    def map_sequence(self):
-        result = {}
-        for url in self.sequence:
-            parent = self.sequence[url]
-            path = [url]
-            while parent:
-                if parent in path:
-                    break
-                path.append(parent)
-                parent = self.sequence[parent]
-
-            path.reverse()
-            result[url] = path
-        return result
-
-    async def bfs_crawl(self, domain):
-        while self.pending_urls:
-            url = self.pending_urls.pop()
-            normalized_url = self.normalize_url(url)
-            if normalized_url not in self.visited_urls and self.is_same_domain(normalized_url, domain):
-                self.visited_urls.add(normalized_url)
-                parent_url = self.sequence[normalized_url]
-                logging.info('Visited URL: %s', normalized_url)
-                if parent_url:
-                    logging.info('Retrieved from: %s', parent_url)
+                # A failed visit is retried like any other failure instead of stopping every tab of the domain
+                logging.error('Visit Error: %s: %s', normalized_url, str(e))
+                status = 'error'
+            finally:
+                session.active_visits -= 1
+            session.in_progress_urls.discard(normalized_url)
+            self.record_visit(session, normalized_url, status)
+            session.pages_since_checkpoint += 1
+            if session.pages_since_checkpoint >= self.checkpoint_interval:
+                self.save_checkpoint(session)
+            if status == 'error':
+                break  # The page may be left unusable, crawl_worker continues with a fresh one
+
+    async def visit_page(self, page, normalized_url, session):
+        # Takes a URL from the frontier, which is already canonical. Returns the page's trace, crawl worker processes
+        # send it back to the coordinator
+        trace = self.metrics.start_page(normalized_url, session.domain)
+        self.page_traces[page] = trace
+        try:
+            await self.explore_page(page, normalized_url, normalized_url, session, trace)
+        except Exception:
+            trace.status = 'error'
+            raise
+        finally:
+            del self.page_traces[page]
+            self.metrics.finish_page(trace, len(session.pending_urls))
+        return trace
+
+    async def explore_page(self, page, url, normalized_url, session, trace):
+        parent_url = session.sequence[normalized_url]
+        logging.info('Visited URL: %s', normalized_url)
+        if parent_url:
+            logging.info('Retrieved from: %s', parent_url)
+
+        if self.http_fetcher:
+            with self.metrics.phase(trace, 'http'):
+                if await self.visit_over_http(url, session):
+                    return
+
+        fingerprinter = self.fingerprinters.get(page)
+        if fingerprinter:
+            fingerprinter.start_navigation()
+        host = urlparse(url).netloc
+        timeout = self.navigation_timeout(host)
+        try:
+            async with self.throttled(page, url) as outcome:
+                with self.metrics.phase(trace, 'navigation'):
+                    started = time.monotonic()
+                    response = await page.goto(url, timeout=timeout * 1000)
+                    if self.host_health:
+                        self.host_health.observe(host, time.monotonic() - started)
+                outcome['ok'] = response is None or is_healthy_status(response.status)
+            if not outcome['ok']:
+                logging.error('Server Error %d: %s', response.status, normalized_url)
+                trace.status = 'server_error'
+                return  # Retried later, the error page has nothing to explore
+            await self.wait_for_settle(page)
+        except Exception as e:
+            from pyppeteer.errors import TimeoutError as NavigationTimeoutError
+            logging.error('Navigation Timeout Error: %s', str(e))
+            if isinstance(e, NavigationTimeoutError):
+                trace.status = 'navigation_timeout'
+                if self.host_health:
+                    self.host_health.observe(host, timeout)
+            else:
+                trace.status = 'navigation_error'
+            return  # Skip to the next URL, record_visit decides whether it is retried
+
+        if fingerprinter:
+            fingerprint = await fingerprinter.fingerprint(response)
+            if fingerprint:
+                session.page_fingerprints[normalized_url] = fingerprint
+            if self.reuse_unchanged_page(normalized_url, fingerprint, session):
+                return
+
+        await self.process_links(page, url, session)
+        if self.route_extractor:
+            await self.seed_static_routes(page, normalized_url, session)
+        await self.execute_ng_click_elements(page, session)
+
+    async def visit_over_http(self, url, session):
+        # Returns False when the page has to be rendered in the browser instead
+        if urlparse(url).fragment.startswith(('/', '!')):
+            return False  # Hash routes only exist once the app's router has run
+        try:
+            async with self.throttled(None, url) as outcome:
+                http_page = await self.http_fetcher.fetch(url)
+                outcome['ok'] = is_healthy_status(http_page.status)
+        except Exception as e:
+            logging.info('HTTP fetch failed, rendering in the browser instead: %s', str(e))
+            return False
+        if http_page.status >= 400:
+            # Bot walls answer plain HTTP clients with 403/429/5xx, the browser may get through or be retried
+            return False
+        if not http_page.is_html:
+            return True
+        normalized_url = url
+        if self.incremental:
+            fingerprint = hashlib.sha256(http_page.body.encode('utf-8')).hexdigest()
+            session.page_fingerprints[normalized_url] = fingerprint
+            if self.reuse_unchanged_page(normalized_url, fingerprint, session):
+                return True
+        analysis = self.http_fetcher.analyze(http_page)
+        if analysis.needs_rendering:
+            logging.info('Page needs JavaScript rendering, switching to the browser')
+            return False
+        for href_value in analysis.links:
+            self.queue_url(href_value, normalized_url, session)
+        return True
+
+    def reuse_unchanged_page(self, normalized_url, fingerprint, session):
+        previous = session.previous_fingerprints.get(normalized_url)
+        if not fingerprint or not previous or previous['fingerprint'] != fingerprint:
+            return False
+        logging.info('Unchanged since the previous crawl, reusing %d recorded links', len(previous['children']))
+        for child_url in previous['children']:
+            self.queue_url(child_url, normalized_url, session, 'reused')
+        return True
+
+    def navigation_timeout(self, host):
+        # Seconds a navigation of the host may take before it counts as failed
+        if self.host_health:
+            return self.host_health.timeout(host)
+        return self.navigation_timeout_seconds
+
+    def circuit_open(self, session, normalized_url):
+        # URLs of a paused host wait in the retry queue without using up one of their attempts
+        if not self.host_health:
+            return False
+        blocked_until = self.host_health.blocked_until(urlparse(normalized_url).netloc)
+        if blocked_until is None:
+            return False
+        heapq.heappush(session.retry_urls, (blocked_until, normalized_url))
+        self.metrics.increment(session.domain, 'circuit_deferred')
+        return True
+
+    def record_visit(self, session, normalized_url, status):
+        failed = status in RETRY_STATUSES
+        if self.host_health:
+            self.host_health.record(urlparse(normalized_url).netloc, not failed)
+        if not failed:
+            session.retry_attempts.pop(normalized_url, None)
+            session.finished_urls.add(normalized_url)
+            return
+        attempts = session.retry_attempts.get(normalized_url, 0) + 1
+        if attempts > self.max_retries:
+            logging.info('Giving up on %s after %d attempts', normalized_url, attempts)
+            self.metrics.increment(session.domain, 'retries_exhausted')
+            session.retry_attempts.pop(normalized_url, None)
+            session.finished_urls.add(normalized_url)
+            return
+        session.retry_attempts[normalized_url] = attempts
+        backoff = min(self.retry_max_backoff, self.retry_backoff * 2 ** (attempts - 1))
+        heapq.heappush(session.retry_urls, (time.monotonic() + backoff, normalized_url))
+        self.metrics.increment(session.domain, 'retries')
+
+    def release_retries(self, session):
+        # Retries whose backoff has passed go back into the frontier at their depth
+        now = time.monotonic()
+        while session.retry_urls and session.retry_urls[0][0] <= now:
+            url = heapq.heappop(session.retry_urls)[1]
+            session.visited_urls.discard(url)
+            session.pending_urls.add(url, session.depth(url))
+
+    @contextlib.asynccontextmanager
+    async def throttled(self, page, url):
+        # Waits for the host's throttle and reports the request's latency and outcome back to it
+        if not self.throttle:
+            yield {'ok': True}
+            return
+        host = urlparse(url).netloc
+        with self.metrics.phase(self.page_traces.get(page), 'throttle'):
+            await self.throttle.acquire(host)
+        outcome = {'ok': False}
+        started = time.monotonic()
+        try:
+            yield outcome
+        finally:
+            self.throttle.release(host, time.monotonic() - started, outcome['ok'])
 
+    async def wait_for_settle(self, page):
+        trace = self.page_traces.get(page)
+        with self.metrics.phase(trace, 'settle'):
+            settled = await self.settle_detectors[page].wait()
+        if trace and not settled:
+            trace.count('settle_timeouts')
+
+    def record_child(self, session, parent_url, child_url):
+        if self.incremental:
+            session.page_children.setdefault(parent_url, set()).add(child_url)
+
+    def queue_url(self, url, parent_url, session, method='link'):
+        return self.add_to_frontier(session, self.normalize_url(url), parent_url, method)
+
+    def add_to_frontier(self, session, normalized_url, parent_url, method):
+        if not self.is_same_domain(normalized_url, session.domain):
+            return False
+        if session.robots and not session.robots.can_fetch(self.sitemap_seeder.user_agent, normalized_url):
+            self.metrics.increment(session.domain, 'robots_disallowed')
+            return False
+        self.record_child(session, parent_url, normalized_url)
+        if session.edge_listener:
+            session.edge_listener(normalized_url, parent_url, method)
+        if normalized_url in session.visited_urls:
+            self.metrics.increment(session.domain, 'duplicates_skipped')
+            return False
+        depth = session.depth(parent_url) + 1 if parent_url else 0
+        if self.max_depth is not None and depth > self.max_depth:
+            self.metrics.increment(session.domain, 'depth_limited')
+            return False
+        # A click proves the route is reachable from the clicked page, so it replaces a parent found by a link
+        if method == 'click' or normalized_url not in session.sequence:
+            session.set_parent(normalized_url, parent_url)
+            if session.edge_stream:
+                session.edge_stream.write(normalized_url, parent_url, method)
+        session.pending_urls.add(normalized_url, depth)
+        session.queued_urls.add(normalized_url)
+        return True
+
+    async def process_links(self, page, parent_url, session):
+        with self.metrics.phase(self.page_traces.get(page), 'links'):
+            href_values = await page.evaluate(EXTRACT_LINKS_JS)
+            normalized_parent_url = self.normalize_url(parent_url)
+            for href_value in href_values:
+                self.queue_url(urljoin(parent_url, href_value), normalized_parent_url, session)
+
+    async def seed_static_routes(self, page, normalized_url, session):
+        # Routes declared in the app's scripts are queued directly, each costs one navigation instead of a click
+        with self.metrics.phase(self.page_traces.get(page), 'routes'):
+            try:
+                route_urls = await self.route_extractor.extract(page, session.route_scripts)
+            except Exception as e:
+                logging.error('Route Extraction Error: %s', str(e))
+                return
+        for route_url in route_urls:
+            self.queue_url(route_url, normalized_url, session, 'route')
+        if route_urls:
+            logging.info('Found %d routes in the scripts of %s', len(route_urls), normalized_url)
+
+    async def execute_ng_click_elements(self, page, session):
+        with self.metrics.phase(self.page_traces.get(page), 'clicks'):
+            await self.explore_clicks(page, session)
+
+    async def explore_clicks(self, page, session):
+        trace = self.page_traces.get(page)
+        recorder = self.route_recorders[page]
+        # Route changes made while the page loaded are not discoveries of a click
+        baseline = await recorder.drain()
+        page_url = baseline['url']
+        current_url = self.normalize_url(page_url)
+        location_url = current_url
+        same_document = True
+        while True:
+            candidates = await page.evaluate(SCAN_CLICKABLE_JS, CLICK_ATTRIBUTES)
+            pending_candidates = [candidate for candidate in candidates
+                                  if candidate['visible'] and candidate['clickFunction'] not in session.executed_functions]
+            has_executed = False
+            needs_restore = False
+            for candidate in pending_candidates:
+                click_function = candidate['clickFunction']
+                if click_function in session.executed_functions:
+                    continue
                 try:
-                    await self.page.goto(url, timeout=15000)
-                    await asyncio.sleep(3)
+                    clicked = await page.evaluate(CLICK_CANDIDATE_JS, candidate['selector'], click_function,
+                                                  CLICK_ATTRIBUTES)
                 except Exception as e:
-                    logging.error('Navigation Timeout Error: %s', str(e))
-                    continue  # Skip to the next URL
-
-                await self.process_links(url, domain)
-                await self.execute_ng_click_elements(domain)
-
-    async def process_links(self, parent_url, domain):
-        links = await self.page.querySelectorAll('a')
-        for link in links:
-            href_value = await self.page.evaluate('(element) => element.href', link)
-            if href_value:
-                normalized_url = self.normalize_url(urljoin(parent_url, href_value))
-                if normalized_url not in self.visited_urls and self.is_same_domain(normalized_url, domain):
-                    normalized_parent_url = self.normalize_url(parent_url)
-                    if normalized_url not in self.sequence:
-                        self.sequence[normalized_url] = normalized_parent_url
-                    self.pending_urls.add(normalized_url)
-
-    async def query_elements_with_attributes(self, attribute_selectors):
-        elements = []
-        for attribute_selector in attribute_selectors:
-            attribute_elements = await self.page.querySelectorAll(attribute_selector)
-            elements.extend(attribute_elements)
-        return elements
-
-    async def execute_ng_click_elements(self, domain):
-        current_url = await self.page.evaluate('window.location.href')
-        current_url = self.normalize_url(current_url)
-        execute_more_functions = True
-        while execute_more_functions:
-            has_executed = False
-            attribute_selectors = ['ng-click', 'click', 'onClick']
-            elements = await self.query_elements_with_attributes([f'[{attr}]' for attr in attribute_selectors])
-            for element in elements:
-                for attribute in attribute_selectors:
-                    click_function = await self.page.evaluate(f'(element) => element.getAttribute("{attribute}")',
-                                                              element)
-                    if click_function:
-                        break
-                if click_function:
-                    is_visible = await element.isIntersectingViewport()
-                    if not is_visible:
-                        continue
-                    if click_function and click_function not in self.executed_functions:
-                        self.executed_functions.add(click_function)
-                        await element.click()
-                        await asyncio.sleep(3)
-                        page_url = await self.page.evaluate('window.location.href')
-                        normalized_url = self.normalize_url(page_url)
-                        if normalized_url != current_url and normalized_url not in self.visited_urls and self.is_same_domain(
-                                normalized_url, domain):
-                            self.pending_urls.add(normalized_url)
-                            self.sequence[normalized_url] = current_url
-                            await self.page.goBack()
-                            await asyncio.sleep(3)
-                        has_executed = True
+                    logging.error('Click Error: %s', str(e))
+                    clicked = True  # The click started a navigation that replaced the execution context
+                if not clicked:
+                    if location_url != current_url or not same_document:
+                        needs_restore = True  # The element belongs to the page state a click navigated away from
                         break
-            if not has_executed:
+                    continue  # The DOM changed since the scan, the next scan will pick the element up again
+                session.executed_functions.add(click_function)
+                has_executed = True
+                if trace:
+                    trace.count('clicks')
+                await self.wait_for_settle(page)
+                # Every route the app's router went through is recorded in the page, no round trip needed to see it
+                routes = await recorder.drain()
+                for route_url in dict.fromkeys(routes['routes'] + [routes['url']]):
+                    normalized_url = self.normalize_url(route_url)
+                    if normalized_url != location_url:
+                        self.add_to_frontier(session, normalized_url, location_url, 'click')
+                location_url = self.normalize_url(routes['url'])
+                same_document = same_document and routes['document'] == baseline['document']
+            # The next scan must run on the crawled page, never on wherever the last click led (another site even)
+            if has_executed and (location_url != current_url or not same_document):
+                needs_restore = True
+            if needs_restore:
+                await self.restore_page(page, recorder, page_url, same_document)
+                location_url = current_url
+                same_document = True
+                baseline = await recorder.drain()
+            elif not has_executed:
                 break
 
+    async def restore_page(self, page, recorder, page_url, same_document):
+        # Only called when a remaining candidate needs the page state the crawl navigated away from
+        trace = self.page_traces.get(page)
+        if trace:
+            trace.count('restores')
+        with self.metrics.phase(trace, 'go_back'):
+            if same_document:
+                await recorder.go_back()
+            else:
+                await page.goBack()
+        await self.wait_for_settle(page)
+        state = await recorder.drain()
+        if self.normalize_url(state['url']) != self.normalize_url(page_url):
+            # replaceState leaves no history entry to go back to, so load the page again
+            with self.metrics.phase(trace, 'go_back'):
+                await page.goto(page_url, timeout=self.navigation_timeout(urlparse(page_url).netloc) * 1000)
+            await self.wait_for_settle(page)
+
     def is_same_domain(self, url, domain):
         return urlparse(url).netloc == domain
 
@@ -198,11 +823,40 @@ class PyppeteerSpider:
             return None, None
 
 
-def run_spider():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Crawl the start_urls in config.json with a headless browser')
+    parser.add_argument('urls', nargs='*', help='start URLs to crawl instead of the start_urls in the config')
+    parser.add_argument('--config', default='config.json', help='path of the configuration file')
+    parser.add_argument('--resume', action='store_true', help='continue each start URL from its last checkpoint')
+    parser.add_argument('--incremental', action='store_true',
+                        help='skip link and click exploration for pages unchanged since the previous crawl')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='number of worker processes, each driving its own browser')
+    parser.add_argument('--shard-by', choices=['domain', 'url'], default='domain',
+                        help='how URLs are assigned to worker processes')
+    parser.add_argument('--warm', type=int, metavar='N',
+                        help='launch N browsers of the browser pool and leave them running for later crawls')
+    parser.add_argument('--close-browsers', action='store_true',
+                        help='close the browsers the browser pool left running')
+    args = parser.parse_args(argv)
+
     logging.getLogger().setLevel(logging.INFO)
 
-    spider = PyppeteerSpider()
-    asyncio.run(spider.crawl_website())
+    spider = PyppeteerSpider(resume=args.resume, incremental=args.incremental, config_path=args.config)
+    if args.urls:
+        spider.start_urls = args.urls
+    if args.close_browsers:
+        asyncio.run(spider.browser_pool.shutdown())
+    elif args.warm:
+        if not spider.browser_pool.keep_alive:
+            parser.error('--warm needs browser_pool keep_alive and user_data_dir in the configuration')
+        asyncio.run(spider.browser_pool.warm(args.warm))
+    elif args.processes > 1:
+        from CrawlCoordinator import CrawlCoordinator
+        CrawlCoordinator(spider, args.processes, args.shard_by).run()
+    else:
+        asyncio.run(spider.crawl_website())
 
 
-run_spider()
+if __name__ == '__main__':
+    main()
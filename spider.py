@@ -72,9 +72,10 @@ class Spider:
                         self.parse_page(absolute_url, current_url, domain)
 
 
-# Configure logging
-logging.getLogger().setLevel(logging.INFO)
+if __name__ == '__main__':
+    # Configure logging
+    logging.getLogger().setLevel(logging.INFO)
 
-# Run the spider
-spider = Spider()
-spider.crawl_website()
+    # Run the spider
+    spider = Spider()
+    spider.crawl_website()
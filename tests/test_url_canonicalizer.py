@@ -0,0 +1,32 @@
+import itertools
+
+from URLCanonicalizer import URLCanonicalizer
+
+HOSTS = ['http://Example.com', 'https://e.com:443', 'http://[::1]:8080', 'https://user:pw@e.com']
+PATHS = ['', '/', '/a', '/a/', '/a//', '/app/index.html', '/%7euser/', '/a%2fb']
+QUERIES = ['', '?', '?lang=en', '?flag', '?b=2&a=1', '?q=a+b', '?x=/', '?utm_source=x', '?a=&a']
+FRAGMENTS = ['', '#', '#/', '#!', '#!/', '#/x', '#/x/', '#/x//', '#top', '#!/a/b/']
+
+
+def test_canonicalize_is_idempotent():
+    for rules in ({}, {'default': {'fragments': 'all'}}, {'default': {'fragments': 'none', 'sort_query': False}}):
+        canonicalizer = URLCanonicalizer(rules)
+        for url in (''.join(parts) for parts in itertools.product(HOSTS, PATHS, QUERIES, FRAGMENTS)):
+            canonical_url = canonicalizer.canonicalize(url)
+            assert canonicalizer.canonicalize(canonical_url) == canonical_url, url
+
+
+def test_trailing_slashes_and_empty_routes():
+    canonicalizer = URLCanonicalizer()
+    assert canonicalizer.canonicalize('https://e.com/') == 'https://e.com'
+    assert canonicalizer.canonicalize('https://e.com/a#/') == 'https://e.com/a'
+    assert canonicalizer.canonicalize('https://e.com/app/?lang=en#!/') == 'https://e.com/app/?lang=en'
+    assert canonicalizer.canonicalize('https://e.com/#/login/') == 'https://e.com/#/login'
+    assert canonicalizer.canonicalize('https://e.com/a/#top') == 'https://e.com/a'
+
+
+def test_query_and_host():
+    canonicalizer = URLCanonicalizer()
+    assert canonicalizer.canonicalize('http://[::1]:8080/') == 'http://[::1]:8080'
+    assert canonicalizer.canonicalize('HTTP://Example.COM:80/p?b=2&flag&a=1') == 'http://example.com/p?a=1&b=2&flag'
+    assert canonicalizer.canonicalize('https://e.com/p?utm_source=x&id=3') == 'https://e.com/p?id=3'